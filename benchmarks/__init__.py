@@ -0,0 +1 @@
+# Reproducible engine benchmarks: python -m benchmarks --help
@@ -0,0 +1,60 @@
+import os
+import sys
+import json
+import logging
+import argparse
+import tempfile
+from src.engine import BACKENDS, HASH_ALGORITHMS
+from .corpus import CORPORA, MB
+from .suite import run_suite, compare
+
+
+def int_list(text):
+    return [int(value) for value in text.split(',') if value]
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description="Benchmark the MeowCatCompress engine on synthetic corpora")
+    parser.add_argument('--work-dir', default=os.path.join(tempfile.gettempdir(), 'meowcat_bench'), help="corpora are generated and kept here")
+    parser.add_argument('--corpus', default=','.join(CORPORA), help=f"comma-separated subset of {','.join(CORPORA)}")
+    parser.add_argument('--scale', type=float, default=1.0, help="multiplies every corpus size")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--levels', type=int_list, default=[1, 5, 9], metavar='N,N')
+    parser.add_argument('--volume-sizes', type=int_list, default=[25], metavar='MB,MB')
+    parser.add_argument('--dictionaries', type=int_list, default=[0], metavar='MB,MB', help="0 sizes the dictionary to the corpus like the memory planner")
+    parser.add_argument('--backends', default=','.join(BACKENDS), help=f"comma-separated subset of {','.join(BACKENDS)}")
+    parser.add_argument('--hash', default='sha256', help=f"comma-separated subset of {','.join(HASH_ALGORITHMS)}")
+    parser.add_argument('-o', '--output', help="write the JSON report here instead of stdout")
+    parser.add_argument('--baseline', help="JSON report of an earlier run to compare throughput against")
+    parser.add_argument('--tolerance', type=float, default=0.1, help="slowdown against the baseline that counts as a regression")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    # The engine logs every archive; only the benchmark's own lines are interesting here
+    logging.getLogger().handlers[0].addFilter(lambda record: record.pathname.startswith(os.path.dirname(__file__)) or record.levelno >= logging.WARNING)
+    corpora = [name for name in args.corpus.split(',') if name]
+    unknown = set(corpora) - set(CORPORA)
+    if unknown:
+        logging.error(f"Unknown corpus: {', '.join(sorted(unknown))}")
+        return 2
+    report = run_suite(args.work_dir, corpora, args.levels, [size * MB for size in args.volume_sizes],
+                       [size * MB for size in args.dictionaries], [name for name in args.backends.split(',') if name],
+                       [name for name in args.hash.split(',') if name], args.seed, args.scale)
+    text = json.dumps(report, indent=4)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        print(text)
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            lines, regressed = compare(report, json.load(f), args.tolerance)
+        sys.stderr.write('\n'.join(lines) + '\n')
+        return 1 if regressed else 0
+    return 0
+
+
+sys.exit(main())
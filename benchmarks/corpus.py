@@ -0,0 +1,117 @@
+import os
+import json
+import random
+import shutil
+
+MB = 1024 * 1024
+CORPUS_INFO = "corpus.json"
+WORDS_PER_FILE = 600
+
+# Every corpus is a function of (seed, scale) only, so two machines generate byte-identical inputs
+CORPORA = ('small_text', 'huge_binary', 'media', 'deep_tree')
+
+
+def vocabulary(rng, count=2000):
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    return [''.join(rng.choice(letters) for _ in range(rng.randint(2, 10))) for _ in range(count)]
+
+
+def text_block(rng, words, count):
+    # Zipf-like word choice so the text compresses like prose rather than like noise
+    lines = []
+    line = []
+    for _ in range(count):
+        line.append(words[min(len(words) - 1, int(rng.paretovariate(1.2)) - 1)] if rng.random() < 0.7 else rng.choice(words))
+        if len(line) >= 12:
+            lines.append(' '.join(line))
+            line = []
+    lines.append(' '.join(line))
+    return ('\n'.join(lines) + '\n').encode()
+
+
+def write_binary(path, rng, size, chunk=4 * MB):
+    # Records of counters, timestamps and short random payloads: compressible, but not like text
+    with open(path, 'wb') as f:
+        written = 0
+        counter = 0
+        while written < size:
+            records = bytearray()
+            while len(records) < min(chunk, size - written):
+                counter += 1
+                records += counter.to_bytes(8, 'little') + (1700000000 + counter // 7).to_bytes(8, 'little') + rng.randbytes(16) + bytes(32)
+            data = bytes(records[:size - written])
+            f.write(data)
+            written += len(data)
+
+
+def write_random(path, rng, size, chunk=4 * MB):
+    # Stands in for already-compressed media: no codec gets anything out of it
+    with open(path, 'wb') as f:
+        written = 0
+        while written < size:
+            data = rng.randbytes(min(chunk, size - written))
+            f.write(data)
+            written += len(data)
+
+
+def make_small_text(root, rng, scale):
+    words = vocabulary(rng)
+    for i in range(int(2000 * scale)):
+        directory = os.path.join(root, f"dir{i // 200:03d}")
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"note{i:05d}.txt"), 'wb') as f:
+            f.write(text_block(rng, words, rng.randint(WORDS_PER_FILE // 4, WORDS_PER_FILE * 2)))
+
+
+def make_huge_binary(root, rng, scale):
+    os.makedirs(root, exist_ok=True)
+    for i in range(2):
+        write_binary(os.path.join(root, f"dump{i}.bin"), rng, int(64 * MB * scale))
+
+
+def make_media(root, rng, scale):
+    os.makedirs(root, exist_ok=True)
+    for i in range(4):
+        write_random(os.path.join(root, f"clip{i}.mp4"), rng, int(16 * MB * scale))
+
+
+def make_deep_tree(root, rng, scale, depth=12):
+    words = vocabulary(rng, 500)
+    leaves = max(1, int(400 * scale))
+    for i in range(leaves):
+        parts = [f"level{d}_{rng.randint(0, 2)}" for d in range(rng.randint(depth // 2, depth))]
+        directory = os.path.join(root, *parts)
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"leaf{i:04d}.txt"), 'wb') as f:
+            f.write(text_block(rng, words, rng.randint(20, WORDS_PER_FILE)))
+
+
+GENERATORS = {
+    'small_text': make_small_text,
+    'huge_binary': make_huge_binary,
+    'media': make_media,
+    'deep_tree': make_deep_tree
+}
+
+
+def corpus_path(work_dir, name):
+    return os.path.join(work_dir, 'corpus', name)
+
+
+def generate(work_dir, name, seed=0, scale=1.0):
+    # Reuses the corpus from an earlier run when it was generated with the same seed and scale
+    root = corpus_path(work_dir, name)
+    info_path = os.path.join(work_dir, 'corpus', name + '.' + CORPUS_INFO)
+    info = {"name": name, "seed": seed, "scale": scale}
+    try:
+        with open(info_path, 'r', encoding='utf-8') as f:
+            if json.load(f) == info and os.path.isdir(root):
+                return root
+    except (OSError, ValueError):
+        pass
+    shutil.rmtree(root, ignore_errors=True)
+    # Each corpus gets its own stream so adding a corpus never changes the others
+    GENERATORS[name](root, random.Random(f"{seed}:{name}"), scale)
+    with open(info_path, 'w', encoding='utf-8') as f:
+        json.dump(info, f)
+    return root
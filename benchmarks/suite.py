@@ -0,0 +1,182 @@
+import os
+import sys
+import time
+import shutil
+import logging
+import platform
+import tempfile
+from src.engine import (scan_tree, input_size, hash_files, InputManifest, entry_fingerprint, compress_file, split_and_compress_file,
+                        dictionary_for, get_backend, cpu_budget, HASH_ALGORITHMS)
+from .corpus import generate, MB
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def reset_peak_rss():
+    # Linux only: writing 5 to clear_refs restarts VmHWM so every phase gets its own peak
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def peak_rss():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if resource is not None:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+    return None
+
+
+def children_peak_rss():
+    # High-water mark over every 7z process so far; it cannot be reset, so phases only ever raise it
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+
+
+def measure(corpus, phase, config, func, input_bytes):
+    reset_peak_rss()
+    start = time.perf_counter()
+    output_bytes = func()
+    seconds = time.perf_counter() - start
+    result = {
+        "corpus": corpus,
+        "phase": phase,
+        "config": config,
+        "seconds": seconds,
+        "input_bytes": input_bytes,
+        "output_bytes": output_bytes,
+        "mb_per_s": input_bytes / MB / seconds if seconds > 0 else None,
+        "ratio": output_bytes / input_bytes if output_bytes is not None and input_bytes else None,
+        "peak_rss": peak_rss(),
+        "children_peak_rss": children_peak_rss()
+    }
+    logging.info(f"{corpus:12} {phase:9} {config} {result['mb_per_s'] or 0:9.1f} MB/s")
+    return result
+
+
+def available_backends(backends):
+    usable = []
+    for name in backends:
+        if name == '7z' and shutil.which('7z') is None:
+            logging.warning("7z is not on PATH, skipping the 7z backend")
+            continue
+        usable.append(name)
+    return usable
+
+
+def bench_corpus(name, root, work_dir, levels, volume_sizes, dictionaries, backends, algorithms):
+    results = []
+    index = scan_tree(root)
+    size = index.size
+    results.append(measure(name, 'scan', {}, lambda: scan_tree(root) and None, size))
+
+    def manifest_pass():
+        output_dir = tempfile.mkdtemp(dir=work_dir, prefix='manifest_')
+        try:
+            with InputManifest(output_dir) as manifest:
+                entries = index.dirs() + index.files()
+                for entry in entries:
+                    manifest.record(entry.path, entry.size, entry.mtime, entry_fingerprint(entry), entry.path)
+                for entry in entries:
+                    manifest.unchanged(entry.path, entry.size, entry.mtime, lambda: entry_fingerprint(entry))
+        finally:
+            shutil.rmtree(output_dir, ignore_errors=True)
+        return None
+    results.append(measure(name, 'manifest', {"entries": len(index.entries)}, manifest_pass, size))
+
+    for backend in backends:
+        extension = get_backend(backend).extension
+        for level in levels:
+            for dictionary in dictionaries:
+                dictionary = dictionary or dictionary_for(size)
+                config = {"backend": backend, "level": level, "dictionary_mb": dictionary // MB, "threads": cpu_budget()}
+                output_dir = tempfile.mkdtemp(dir=work_dir, prefix='compress_')
+                try:
+                    archive = os.path.join(output_dir, os.path.basename(root) + extension)
+                    results.append(measure(name, 'compress', config, lambda: compress_file(root, output_dir, None, level, cpu_budget(), dictionary, backend)
+                                           and os.path.getsize(archive), size))
+                finally:
+                    shutil.rmtree(output_dir, ignore_errors=True)
+                for volume_size in volume_sizes:
+                    split_config = dict(config, volume_size_mb=volume_size // MB)
+                    output_dir = tempfile.mkdtemp(dir=work_dir, prefix='split_')
+                    try:
+                        archive_path = os.path.join(output_dir, os.path.basename(root))
+                        results.append(measure(name, 'split', split_config, lambda: split_and_compress_file(
+                            root, output_dir, volume_size, None, level, cpu_budget(), dictionary, backend, checksums=()) and volume_bytes(archive_path), size))
+                        parts = volume_paths(archive_path)
+                        for algorithm in algorithms:
+                            results.append(measure(name, 'hash', dict(split_config, algorithm=algorithm),
+                                                   lambda: hash_files(parts, (algorithm,)) and None, sum(os.path.getsize(p) for p in parts)))
+                    finally:
+                        shutil.rmtree(output_dir, ignore_errors=True)
+    return results
+
+
+def volume_paths(archive_path):
+    if not os.path.isdir(archive_path):
+        return []
+    return sorted(os.path.join(archive_path, f) for f in os.listdir(archive_path) if f != 'info.json')
+
+
+def volume_bytes(archive_path):
+    return sum(os.path.getsize(path) for path in volume_paths(archive_path))
+
+
+def run_suite(work_dir, corpora, levels, volume_sizes, dictionaries, backends, algorithms=('sha256',), seed=0, scale=1.0):
+    os.makedirs(work_dir, exist_ok=True)
+    backends = available_backends(backends)
+    results = []
+    for name in corpora:
+        start = time.perf_counter()
+        root = generate(work_dir, name, seed, scale)
+        logging.info(f"Corpus {name}: {input_size(root) / MB:.1f} MB ready in {time.perf_counter() - start:.1f}s")
+        results.extend(bench_corpus(name, root, work_dir, levels, volume_sizes, dictionaries, backends, algorithms))
+    return {
+        "meta": {
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "cpu_count": cpu_budget(),
+            "seed": seed,
+            "scale": scale,
+            "backends": backends,
+            "hash_algorithms": [a for a in algorithms if a in HASH_ALGORITHMS]
+        },
+        "results": results
+    }
+
+
+def result_key(result):
+    return result["corpus"], result["phase"], tuple(sorted(result["config"].items()))
+
+
+def compare(current, baseline, tolerance=0.1):
+    # Lines describing throughput changes against a baseline run, and whether any phase slowed down past tolerance
+    previous = {result_key(result): result for result in baseline.get("results", [])}
+    lines = []
+    regressed = False
+    for result in current["results"]:
+        old = previous.get(result_key(result))
+        if old is None or not old.get("mb_per_s") or not result.get("mb_per_s"):
+            continue
+        change = result["mb_per_s"] / old["mb_per_s"] - 1
+        flag = ""
+        if change < -tolerance:
+            flag = "  REGRESSION"
+            regressed = True
+        config = ' '.join(f"{k}={v}" for k, v in sorted(result["config"].items()))
+        lines.append(f"{result['corpus']:12} {result['phase']:9} {config:60} {old['mb_per_s']:9.1f} -> {result['mb_per_s']:9.1f} MB/s {change:+7.1%}{flag}")
+    return lines, regressed
@@ -1,5 +1,6 @@
 from .work import Work
 from .setting import Setting
 from .about import About
+from .compressor_widget import CompressorWidget
 
-__all__ = ['Work', 'Setting', 'About']
\ No newline at end of file
+__all__ = ['Work', 'Setting', 'About', 'CompressorWidget']
\ No newline at end of file
@@ -1,4 +1,5 @@
-from src.importer import *
+from src.importer import (Qt, QSize, QUrl, QPainter, QFont, QPainterPath, QDesktopServices, QWidget, QVBoxLayout,
+                          QHBoxLayout, FluentIcon, setCustomStyleSheet, PushButton)
 from src.module import *
 
 
@@ -9,11 +10,11 @@ class About_Background(QWidget):
     def paintEvent(self, event):
         painter = QPainter(self)
         painter.setRenderHint(QPainter.Antialiasing)
-        pixmap = QPixmap(os.path.join(cfg.IMAGE, 'bg_about.png'))
+        pixmap = pixmapCache.pixmap('bg_about.png', self.size(), self.devicePixelRatioF())
         path = QPainterPath()
         path.addRoundedRect(self.rect(), 20, 20)
         painter.setClipPath(path)
-        painter.drawPixmap(0, 0, self.width(), self.height(), pixmap)
+        painter.drawPixmap(0, 0, pixmap)
 
         painter.setPen(Qt.white)
         painter.setFont(QFont(cfg.APP_FONT, 45))
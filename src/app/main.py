@@ -1,11 +1,20 @@
+import sys
+import time
+import logging
+import subprocess
 from . import *
-from src.importer import *
+from src.importer import (winreg, Qt, QSize, QIcon, QTimer, QApplication, FluentIcon, Theme, setThemeColor, MSFluentWindow,
+                          NavigationItemPosition, setTheme, SplashScreen)
 from src.module import *
+from src.engine import span
 
 
 class Main(MSFluentWindow):
-    def __init__(self):
+    def __init__(self, started=None):
         super().__init__()
+        # perf_counter() taken by the launcher before its imports; time-to-interactive is measured from there
+        self.started = time.perf_counter() if started is None else started
+        self.interactiveSeconds = None
         self.handleFontCheck()
 
         self.titleBar.maxBtn.setHidden(True)
@@ -18,7 +27,8 @@ class Main(MSFluentWindow):
         self.setFixedSize(1280, 768)
         self.setWindowIcon(QIcon(cfg.ICON))
         self.handleCenterWindow()
-        self.compressorWidget = CompressorWidget(self)
+        with span('create_page', 'gui', page='CompressorInterface'):
+            self.compressorWidget = CompressorWidget(self)
         self.addSubInterface(self.compressorWidget, FluentIcon.FOLDER, self.tr('压缩工具'), FluentIcon.FOLDER_OPEN)
         setTheme(cfg.get(cfg.themeMode))
         setThemeColor(cfg.get(cfg.themeColor))
@@ -27,18 +37,19 @@ class Main(MSFluentWindow):
         self.splashScreen.setIconSize(QSize(200, 200))
         self.splashScreen.raise_()
         self.show()
-        QApplication.processEvents()
         self.__initNavigation()
-        self.splashScreen.finish()
         self.__initInfo()
+        # The compressor page is all the first frame needs; the splash goes on the first event loop turn
+        QTimer.singleShot(0, self.handleInteractive)
 
     def __initNavigation(self):
-        self.workInterface = Work('WorkInterface', self)
+        # Only placeholders here, each page is built the first time it is navigated to
+        self.workInterface = LazyPage('WorkInterface', Work, self)
         self.addSubInterface(self.workInterface, FluentIcon.HOME, self.tr('主页'), FluentIcon.HOME_FILL)
-        self.settingInterface = Setting('SettingInterface', self)
+        self.settingInterface = LazyPage('SettingInterface', Setting, self)
+        self.settingInterface.pageCreated.connect(StyleSheet.SETTING_INTERFACE.apply)
         self.addSubInterface(self.settingInterface, FluentIcon.SETTING, self.tr('设置'), FluentIcon.SETTING)
-        StyleSheet.SETTING_INTERFACE.apply(self.settingInterface)
-        self.aboutInterface = About('AboutInterface', self)
+        self.aboutInterface = LazyPage('AboutInterface', About, self)
         self.addSubInterface(self.aboutInterface, FluentIcon.INFO, self.tr('关于'), FluentIcon.INFO)
 
         self.navigationInterface.addItem(
@@ -53,12 +64,20 @@ class Main(MSFluentWindow):
     def __initInfo(self):
         pass
 
+    def handleInteractive(self):
+        self.splashScreen.finish()
+        self.interactiveSeconds = time.perf_counter() - self.started
+        logging.info(f"Interactive after {self.interactiveSeconds * 1000:.0f} ms")
+
     def handleCenterWindow(self):
         desktop = QApplication.screens()[0].availableGeometry()
         w, h = desktop.width(), desktop.height()
         self.move(w // 2 - self.width() // 2, h // 2 - self.height() // 2)
 
     def handleFontCheck(self):
+        # The font is installed through the Windows registry; elsewhere it is left to the system
+        if winreg is None:
+            return
         isSetupFont = False
         registry_keys = [
             (winreg.HKEY_LOCAL_MACHINE, r"SOFTWARE\Microsoft\Windows NT\CurrentVersion\Fonts"),
@@ -1,4 +1,6 @@
-from src.importer import *
+import sys
+from src.importer import (QProcess, QWidget, PrimaryPushSettingCard, FluentIcon, ExpandLayout, setThemeColor,
+                          CustomColorSettingCard, ComboBoxSettingCard, SmoothScrollArea)
 from src.module import *
 
 
@@ -1,4 +1,4 @@
-from src.importer import *
+from src.importer import QWidget, QVBoxLayout
 from src.module import *
 
 
@@ -0,0 +1,315 @@
+import io
+import os
+import lzma
+import stat
+import tarfile
+import zipfile
+import tempfile
+from .process import run_command
+from .progress import ByteProgress
+from .scanner import input_size
+from .memory import DEFAULT_DICTIONARY, MB
+from .trace import span
+from .checksum import new_hashers
+
+COPY_CHUNK = 1024 * 1024
+# A tar.xz archive starts a new xz stream before a member once the current stream holds this much, so no member
+# needs more than about this much decoded ahead of it to be restored on its own
+XZ_STREAM_SIZE = 16 * MB
+
+
+class BackendError(Exception):
+    pass
+
+
+def volume_name(archive_name, number):
+    # 7z -v names its volumes archive.7z.001, archive.7z.002, ...; the in-process backends follow suit
+    return f"{archive_name}.{number:03d}"
+
+
+class SevenZipBackend:
+    # One 7z process per archive
+    name = '7z'
+    extension = '.7z'
+    supports_password = True
+
+    def command(self, archive_name, source, volume_size=None, password=None, compression_level=1, threads=None, dictionary=None):
+        command = ['7z', 'a', '-md={}m'.format((dictionary or DEFAULT_DICTIONARY) // MB), '-mx={}'.format(compression_level), archive_name, source]
+        if volume_size:
+            command[3:3] = ['-v{}m'.format(volume_size // MB)]
+        if threads:
+            command[2:2] = ['-mmt{}'.format(threads)]
+        if password:
+            command[2:2] = ['-p{}'.format(password), '-mhe']
+        return command
+
+    def create(self, sources, archive_name, volume_size=None, password=None, compression_level=1, threads=None, dictionary=None,
+               cancel=None, progress=None, file_path=None, checksums=(), total_bytes=None):
+        # 7z writes and names its volumes itself, and cannot write a .7z archive to stdout, so there is nothing to return;
+        # the caller lists and hashes the volumes afterwards, and there is no volume index
+        # Callers pass the size their scan already found; walking the inputs again is only the fallback
+        if progress is not None and total_bytes is None:
+            total_bytes = sum(input_size(source) for source in sources)
+        if len(sources) == 1:
+            command = self.command(archive_name, sources[0], volume_size, password, compression_level, threads, dictionary)
+            run_command(command, cancel, progress, file_path or sources[0], total_bytes, archive_name if volume_size else None)
+            return None
+        # Several inputs go through a list file so thousands of them fit on any command line
+        list_fd, list_path = tempfile.mkstemp(prefix='meowcat_', suffix='.txt')
+        try:
+            with os.fdopen(list_fd, 'w', encoding='utf-8') as list_file:
+                list_file.write('\n'.join(sources))
+            command = self.command(archive_name, '@' + list_path, volume_size, password, compression_level, threads, dictionary)
+            command[-2:-2] = ['-scsUTF-8']
+            run_command(command, cancel, progress, file_path or archive_name, total_bytes, archive_name if volume_size else None)
+        finally:
+            os.remove(list_path)
+        return None
+
+
+class VolumeWriter(io.RawIOBase):
+    # One logical archive stream written as fixed-size volumes, or as a single file without a volume size.
+    # Each volume is hashed as its bytes pass through, so nothing has to read the volumes back afterwards.
+    def __init__(self, archive_name, volume_size=None, algorithms=()):
+        self.archive_name = archive_name
+        self.volume_size = volume_size
+        self.algorithms = tuple(algorithms)
+        self.parts = []
+        self.sizes = []
+        self.checksums = []
+        self.entries = []
+        self.position = 0
+        self._current = None
+        self._current_size = 0
+        self._hashers = {}
+
+    def writable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def _finish_volume(self):
+        self._current.close()
+        self._current = None
+        self.sizes.append(self._current_size)
+        self.checksums.append({name: hasher.hexdigest() for name, hasher in self._hashers.items()})
+
+    def _next_volume(self):
+        if self._current is not None:
+            self._finish_volume()
+        path = volume_name(self.archive_name, len(self.parts) + 1) if self.volume_size else self.archive_name
+        self._current = open(path, 'wb')
+        self._current_size = 0
+        self._hashers = new_hashers(self.algorithms)
+        self.parts.append(path)
+
+    def write(self, data):
+        view = memoryview(data).cast('B')
+        written = 0
+        while written < len(view):
+            if self._current is None or (self.volume_size and self._current_size >= self.volume_size):
+                self._next_volume()
+            count = len(view) - written
+            if self.volume_size:
+                count = min(count, self.volume_size - self._current_size)
+            chunk = view[written:written + count]
+            self._current.write(chunk)
+            for hasher in self._hashers.values():
+                hasher.update(chunk)
+            self._current_size += count
+            written += count
+        self.position += written
+        return written
+
+    def close(self):
+        if not self.closed:
+            if self._current is None and not self.parts:
+                # An empty archive still gets its (first) volume
+                self._next_volume()
+            if self._current is not None:
+                self._finish_volume()
+        super().close()
+
+    def volumes(self):
+        # (path, size, checksums) for every volume written; only complete once the writer is closed
+        return list(zip(self.parts, self.sizes, self.checksums))
+
+    def covering(self, start, end):
+        # First and last part number holding the stream bytes [start, end)
+        if not self.volume_size:
+            return [1, 1]
+        return [start // self.volume_size + 1, max(start, end - 1) // self.volume_size + 1]
+
+    def add_entry(self, name, size, start, end, **fields):
+        # Volume index entry: where one member's bytes sit in the stream and which parts hold them
+        self.entries.append(dict(name=name, size=size, offset=start, length=end - start, parts=self.covering(start, end), **fields))
+
+
+def walk_sources(sources):
+    # (path, name inside the archive) for every source and everything below it, the way 7z stores them
+    for source in sources:
+        source = os.path.normpath(source)
+        base = os.path.dirname(source)
+        yield source, os.path.relpath(source, base)
+        if os.path.isdir(source):
+            for root, dirs, files in os.walk(source):
+                dirs.sort()
+                for name in dirs + sorted(files):
+                    path = os.path.join(root, name)
+                    yield path, os.path.relpath(path, base)
+
+
+class PythonBackend:
+    # In-process archives through tarfile + lzma (.tar.xz) or zipfile (.zip); no process spawn per archive
+    supports_password = False
+
+    def __init__(self, name):
+        if name not in PYTHON_FORMATS:
+            raise ValueError(f"Unsupported backend: {name}")
+        self.name = name
+        self.extension = PYTHON_FORMATS[name]
+
+    def create(self, sources, archive_name, volume_size=None, password=None, compression_level=1, threads=None, dictionary=None,
+               cancel=None, progress=None, file_path=None, checksums=(), total_bytes=None):
+        # Returns the closed VolumeWriter: its volumes were hashed while written, and its entries index every member
+        if password:
+            raise BackendError(f"The {self.name} backend cannot encrypt archives, use the 7z backend with a password")
+        if progress is not None and total_bytes is None:
+            total_bytes = sum(input_size(source) for source in sources)
+        meter = ByteProgress(file_path or archive_name, total_bytes, progress)
+        writer = VolumeWriter(archive_name, volume_size, checksums)
+        try:
+            # Volume numbers are only reported for split archives, as with 7z
+            parts = writer.parts if volume_size else []
+            with span('codec', backend=self.name, archive=archive_name):
+                if self.name == 'xz':
+                    self._write_tar(writer, parts, sources, compression_level, dictionary, cancel, meter)
+                else:
+                    self._write_zip(writer, parts, sources, compression_level, cancel, meter)
+        except (OSError, lzma.LZMAError, tarfile.TarError, zipfile.BadZipFile) as e:
+            raise BackendError(str(e)) from e
+        finally:
+            writer.close()
+        meter.finish(len(writer.parts) if volume_size else None)
+        return writer
+
+    @staticmethod
+    def _copy(path, target, cancel, meter, writer_parts):
+        with open(path, 'rb') as source:
+            while True:
+                if cancel is not None:
+                    cancel.check()
+                chunk = source.read(COPY_CHUNK)
+                if not chunk:
+                    break
+                target.write(chunk)
+                meter.advance(len(chunk), len(writer_parts) or None, path)
+
+    def _write_tar(self, writer, parts, sources, compression_level, dictionary, cancel, meter):
+        # xz has no stored mode, so -mx0 becomes preset 0, the fastest LZMA2 setting
+        filters = {'id': lzma.FILTER_LZMA2, 'preset': compression_level}
+        if dictionary:
+            filters['dict_size'] = dictionary
+        streams = _XzStreams(writer, [filters])
+        members = []
+        with tarfile.open(fileobj=streams, mode='w', format=tarfile.PAX_FORMAT) as tar:
+            for path, arcname in walk_sources(sources):
+                info = tar.gettarinfo(path, arcname.replace(os.sep, '/'))
+                if info.isreg():
+                    if streams.pending() >= XZ_STREAM_SIZE or (streams.pending() and info.size >= XZ_STREAM_SIZE):
+                        streams.restart()
+                    offset = tar.offset
+                    with open(path, 'rb') as source:
+                        tar.addfile(info, _CopyReader(source, path, cancel, meter, parts))
+                    members.append((info.name, info.size, len(streams.streams) - 1, offset))
+                else:
+                    tar.addfile(info)
+        streams.close()
+        for name, size, number, offset in members:
+            start, end, uncompressed_start = streams.streams[number]
+            writer.add_entry(name, size, start, end, skip=offset - uncompressed_start)
+
+    def _write_zip(self, writer, parts, sources, compression_level, cancel, meter):
+        # zipfile has no level for LZMA, so -mx0 means stored and anything else LZMA
+        compression = zipfile.ZIP_STORED if compression_level == 0 else zipfile.ZIP_LZMA
+        with zipfile.ZipFile(writer, 'w', compression=compression, allowZip64=True) as archive:
+            for path, arcname in walk_sources(sources):
+                info = zipfile.ZipInfo.from_file(path, arcname)
+                if stat.S_ISDIR(os.stat(path).st_mode):
+                    archive.writestr(info, b'')
+                    continue
+                info.compress_type = compression
+                with archive.open(info, 'w', force_zip64=True) as target:
+                    self._copy(path, target, cancel, meter, parts)
+                # Local header, data and data descriptor; the index keeps what the central directory would say
+                writer.add_entry(info.filename, info.file_size, info.header_offset, writer.tell(),
+                                 crc=info.CRC, compressed_size=info.compress_size, compress_type=info.compress_type)
+
+
+class _XzStreams:
+    # File object for tarfile that compresses into the writer as a series of concatenated xz streams. Any xz
+    # decoder reads them as one archive, and a member can be decoded starting from the stream it begins in.
+    def __init__(self, writer, filters):
+        self.writer = writer
+        self.filters = filters
+        self.position = 0
+        self.streams = []
+        self._compressor = None
+
+    def tell(self):
+        return self.position
+
+    def pending(self):
+        # Uncompressed bytes written to the current stream
+        return self.position - self.streams[-1][2] if self._compressor is not None else 0
+
+    def write(self, data):
+        if self._compressor is None:
+            self._compressor = lzma.LZMACompressor(format=lzma.FORMAT_XZ, filters=self.filters)
+            # (compressed start, compressed end, uncompressed start); the end is filled in when the stream closes
+            self.streams.append([self.writer.tell(), None, self.position])
+        self.writer.write(self._compressor.compress(data))
+        self.position += len(data)
+        return len(data)
+
+    def restart(self):
+        if self._compressor is not None:
+            self.writer.write(self._compressor.flush())
+            self._compressor = None
+            self.streams[-1][1] = self.writer.tell()
+
+    def close(self):
+        self.restart()
+
+
+class _CopyReader:
+    # File object handed to tarfile.addfile so the copy loop still checks for cancel and reports progress
+    def __init__(self, source, path, cancel, meter, writer_parts):
+        self._file = source
+        self.path = path
+        self.cancel = cancel
+        self.meter = meter
+        self.writer_parts = writer_parts
+
+    def read(self, size=-1):
+        if self.cancel is not None:
+            self.cancel.check()
+        chunk = self._file.read(size)
+        if chunk:
+            self.meter.advance(len(chunk), len(self.writer_parts) or None, self.path)
+        return chunk
+
+
+PYTHON_FORMATS = {'xz': '.tar.xz', 'zip': '.zip'}
+BACKENDS = ('7z',) + tuple(PYTHON_FORMATS)
+DEFAULT_BACKEND = '7z'
+
+
+def get_backend(backend=None):
+    # Accepts a backend object, a backend name, or None for the 7z CLI
+    if backend is None or backend == DEFAULT_BACKEND:
+        return SevenZipBackend()
+    if isinstance(backend, str):
+        return PythonBackend(backend)
+    return backend
@@ -0,0 +1,55 @@
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+HASH_ALGORITHMS = ('md5', 'sha256', 'blake2b')
+DEFAULT_ALGORITHMS = ('sha256',)
+CHUNK_SIZE = 8 * 1024 * 1024
+HASH_WORKERS = 4
+
+
+def parse_checksums(text):
+    # "md5, sha256" -> ('md5', 'sha256'); an empty string turns checksums off
+    algorithms = tuple(dict.fromkeys(name.strip().lower() for name in text.replace(',', ' ').split()))
+    unknown = [name for name in algorithms if name not in HASH_ALGORITHMS]
+    if unknown:
+        raise ValueError(f"Unsupported checksum algorithm: {', '.join(unknown)} (choose from {', '.join(HASH_ALGORITHMS)})")
+    return algorithms
+
+
+def new_hashers(algorithms):
+    for name in algorithms:
+        if name not in HASH_ALGORITHMS:
+            raise ValueError(f"Unsupported checksum algorithm: {name}")
+    return {name: hashlib.new(name) for name in algorithms}
+
+
+def hash_file(file_path, algorithms=DEFAULT_ALGORITHMS, chunk_size=CHUNK_SIZE):
+    # One large buffer reused for every read; each chunk feeds all requested algorithms at once
+    hashers = new_hashers(algorithms)
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    with open(file_path, 'rb', buffering=0) as f:
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            for hasher in hashers.values():
+                hasher.update(view[:n])
+    return {name: hasher.hexdigest() for name, hasher in hashers.items()}
+
+
+def hash_files(file_paths, algorithms=DEFAULT_ALGORITHMS, workers=HASH_WORKERS):
+    # hashlib drops the GIL on large updates, so threads hash volumes truly in parallel
+    def run(file_path):
+        try:
+            return hash_file(file_path, algorithms)
+        except OSError as e:
+            logging.error(f"Failed to calculate checksums for {file_path}: {e}")
+            return {}
+
+    file_paths = list(file_paths)
+    if workers <= 1 or len(file_paths) <= 1:
+        return {file_path: run(file_path) for file_path in file_paths}
+    with ThreadPoolExecutor(max_workers=min(workers, len(file_paths))) as executor:
+        return dict(zip(file_paths, executor.map(run, file_paths)))
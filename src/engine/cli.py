@@ -0,0 +1,286 @@
+import os
+import sys
+import json
+import logging
+import argparse
+import subprocess
+from .compressor import copy_file, process_directory
+from .progress import format_progress
+from .estimate import plan_run, format_plan
+from .restore import restore_member, restore_outputs, read_info, RestoreError
+from .verify import verify_outputs
+from .jobqueue import JobQueue, run_queue, default_queue_path
+from .watch import watch_directories, SETTLE_SECONDS, POLL_INTERVAL, BACKLOG
+from .process import CancelToken
+from .backends import BACKENDS, DEFAULT_BACKEND
+from .checksum import parse_checksums, HASH_ALGORITHMS, DEFAULT_ALGORITHMS
+from .metrics import configure as configure_metrics
+from .trace import start_profiling, PROFILE_ENV
+from .i18n import set_language, LANGUAGES
+
+MB = 1024 * 1024
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m src.engine', description="MeowCatCompress headless engine")
+    parser.add_argument('--lang', choices=LANGUAGES, default='en', help="language of log messages")
+    parser.add_argument('-q', '--quiet', action='store_true', help="only log warnings and errors")
+    parser.add_argument('--metrics-jsonl', metavar='PATH', help="append one JSON record per archive job to this file")
+    parser.add_argument('--profile', metavar='DIR', help=f"write a Chrome trace of every engine phase to DIR (same as {PROFILE_ENV}=DIR)")
+    parser.add_argument('--cprofile', action='store_true', help="with --profile, also run cProfile and write a .pstats file")
+    parser.add_argument('--sample-ms', type=float, metavar='MS', help="with --profile, sample Python stacks every MS milliseconds into a .folded file")
+    parser.add_argument('--metrics-prom', metavar='PATH', help="keep job totals in this Prometheus textfile-collector file (*.prom)")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    compress = commands.add_parser('compress', help="split and compress a file or directory")
+    compress.add_argument('input', help="input file or directory")
+    compress.add_argument('output_dir', help="output directory, created if missing")
+    add_compress_arguments(compress)
+    compress.add_argument('--progress', action='store_true', help="print 7z progress to stderr")
+    compress.set_defaults(handler=run_compress)
+
+    plan = commands.add_parser('plan', help="show what compress would do, with size and time estimates, without running 7z")
+    plan.add_argument('input', help="input file or directory")
+    plan.add_argument('output_dir', help="output directory the run would write to")
+    add_compress_arguments(plan)
+    plan.add_argument('--json', action='store_true', help="print the plan as JSON instead of a table")
+    plan.set_defaults(handler=run_plan)
+
+    restore = commands.add_parser('restore', help="extract everything under an output directory, or one member of a split archive")
+    restore.add_argument('archive', help="output directory of earlier compress runs, or a split archive directory holding info.json")
+    restore.add_argument('member', nargs='?', help="restore only this member of the split archive, reading only the volumes it needs")
+    restore.add_argument('-o', '--output-dir', default='.', help="directory everything is restored into")
+    restore.add_argument('--password', default=None)
+    restore.add_argument('--list', action='store_true', help="list the indexed members of a split archive and the parts holding each")
+    restore.add_argument('-j', '--jobs', type=int, default=0, help="archives extracted in parallel, 0 for one per CPU")
+    restore.add_argument('--io-limit', type=int, default=None, metavar='N',
+                         help="extractions reading the same device at once (default: 2 on spinning disks, --jobs otherwise)")
+    restore.add_argument('--json', action='store_true', help="with a whole output directory, print one result per archive as JSON")
+    restore.set_defaults(handler=run_restore)
+
+    verify = commands.add_parser('verify', help="test every archive and volume set under an output directory")
+    verify.add_argument('output_dir', help="output directory of earlier compress runs")
+    verify.add_argument('-j', '--jobs', type=int, default=0, help="archives tested in parallel, 0 for one per CPU")
+    verify.add_argument('--password', default=None)
+    verify.add_argument('--no-cache', dest='cache', action='store_false', help="retest archives that passed before and have not changed")
+    verify.add_argument('--json', action='store_true', help="print one result per archive as JSON")
+    verify.set_defaults(handler=run_verify)
+
+    queue = commands.add_parser('queue', help="durable job queue: add many inputs, then run them with a worker pool")
+    queue.add_argument('--queue', metavar='PATH', default=None, help=f"queue database (default: {default_queue_path()})")
+    actions = queue.add_subparsers(dest='action', required=True)
+    add = actions.add_parser('add', help="queue inputs with their own compression settings")
+    add.add_argument('inputs', nargs='+', help="input files or directories")
+    add.add_argument('-o', '--output-dir', required=True, help="output directory for these inputs")
+    add_compress_arguments(add)
+    add.set_defaults(handler=run_queue_add)
+    run = actions.add_parser('run', help="process queued jobs until none are left")
+    run.add_argument('-j', '--jobs', type=int, default=1, help="queued jobs run at the same time")
+    run.add_argument('--password', default=None, help="password for every job; passwords are never stored in the queue")
+    run.add_argument('--follow', action='store_true', help="keep waiting for new jobs instead of stopping when the queue is empty")
+    run.add_argument('--progress', action='store_true', help="print 7z progress to stderr")
+    run.set_defaults(handler=run_queue_run)
+    status = actions.add_parser('status', help="show job counts, or the jobs themselves")
+    status.add_argument('--state', choices=('queued', 'running', 'done', 'failed'), help="list the jobs in this state")
+    status.add_argument('--json', action='store_true')
+    status.set_defaults(handler=run_queue_status)
+    retry = actions.add_parser('retry', help="put failed jobs back in the queue")
+    retry.set_defaults(handler=run_queue_retry)
+    purge = actions.add_parser('purge', help="delete finished jobs")
+    purge.set_defaults(handler=run_queue_purge)
+
+    watch = commands.add_parser('watch', help="archive every file or directory dropped into the watched directories, until Ctrl-C")
+    watch.add_argument('inputs', nargs='+', help="directories to watch")
+    watch.add_argument('-o', '--output-dir', required=True, help="output directory, one subdirectory per watched directory when there are several")
+    add_compress_arguments(watch)
+    watch.add_argument('--workers', type=int, default=1, help="inputs archived at the same time")
+    watch.add_argument('--backlog', type=int, default=BACKLOG, help="settled inputs queued ahead of the workers before new ones are held back")
+    watch.add_argument('--settle', type=float, default=SETTLE_SECONDS, metavar='SECONDS', help="an input must stay unchanged this long before it is archived")
+    watch.add_argument('--poll', action='store_true', help="rescan instead of using inotify")
+    watch.add_argument('--poll-interval', type=float, default=POLL_INTERVAL, metavar='SECONDS')
+    watch.add_argument('--progress', action='store_true', help="print 7z progress to stderr")
+    watch.set_defaults(handler=run_watch)
+    return parser
+
+
+def add_compress_arguments(parser):
+    parser.add_argument('--size-threshold', type=int, default=25, metavar='MB', help="inputs above this size use the large volume size")
+    parser.add_argument('--large-volume-size', type=int, default=25, metavar='MB')
+    parser.add_argument('--small-volume-size', type=int, default=25, metavar='MB')
+    parser.add_argument('--subdirs', action='store_true', help="compress each top-level subdirectory separately")
+    parser.add_argument('--small-file-action', choices=('compress', 'split_compress'), default='compress')
+    parser.add_argument('--password', default=None)
+    parser.add_argument('--level', type=int, default=1, choices=range(10), metavar='0-9', help="compression level")
+    parser.add_argument('-j', '--jobs', type=int, default=1, help="upper limit on parallel 7z processes for --subdirs, 0 lets the memory planner decide")
+    parser.add_argument('--memory', type=int, default=None, metavar='MB', help="memory budget for all 7z processes together (default: half of physical memory)")
+    parser.add_argument('--no-incremental', dest='incremental', action='store_false', help="recompress inputs even if unchanged")
+    parser.add_argument('--pack', action='store_true', help="with --subdirs, combine small inputs into archives of about --small-volume-size")
+    parser.add_argument('--backend', choices=BACKENDS, default=DEFAULT_BACKEND,
+                        help="7z runs one 7z process per archive; xz (.tar.xz) and zip archive in process without 7z")
+    parser.add_argument('--auto-level', action='store_true', help="sample each input and store or cheaply compress incompressible data")
+    parser.add_argument('--checksums', type=checksum_list, default=DEFAULT_ALGORITHMS, metavar='LIST',
+                        help=f"comma-separated checksums recorded for every split volume, from {', '.join(HASH_ALGORITHMS)}; empty for none "
+                             f"(default: {','.join(DEFAULT_ALGORITHMS)})")
+
+
+def checksum_list(value):
+    try:
+        return parse_checksums(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def print_progress(event):
+    sys.stderr.write(f"\r{os.path.basename(event.file_path)}: {format_progress(event)}\033[K")
+    if event.percent >= 100:
+        sys.stderr.write("\n")
+    sys.stderr.flush()
+
+
+def run_compress(args):
+    if not os.path.exists(args.input):
+        logging.error(f"Input {args.input} does not exist")
+        return 2
+    os.makedirs(args.output_dir, exist_ok=True)
+    progress = print_progress if args.progress else None
+    if os.path.isdir(args.input):
+        ok = process_directory(args.input, args.output_dir, args.size_threshold * MB, args.large_volume_size * MB,
+                               args.small_volume_size * MB, args.subdirs, args.small_file_action, args.password,
+                               args.level, max(0, args.jobs), args.incremental, progress=progress,
+                               auto_level=args.auto_level, pack_size=args.small_volume_size * MB if args.pack else None,
+                               memory_budget=args.memory * MB if args.memory else None, backend=args.backend, checksums=args.checksums)
+    else:
+        ok = copy_file(args.input, args.output_dir, args.size_threshold * MB, args.large_volume_size * MB,
+                       args.small_volume_size * MB, args.small_file_action, args.password, args.level,
+                       args.incremental, progress=progress, auto_level=args.auto_level,
+                       memory_budget=args.memory * MB if args.memory else None, backend=args.backend, checksums=args.checksums)
+    return 0 if ok else 1
+
+
+def run_plan(args):
+    if not os.path.exists(args.input):
+        logging.error(f"Input {args.input} does not exist")
+        return 2
+    plan = plan_run(args.input, args.output_dir, args.size_threshold * MB, args.large_volume_size * MB, args.small_volume_size * MB,
+                    args.subdirs, args.small_file_action, args.level, max(0, args.jobs), args.incremental, args.auto_level,
+                    args.small_volume_size * MB if args.pack else None, args.memory * MB if args.memory else None,
+                    args.backend)
+    if args.json:
+        print(json.dumps(plan.as_dict(), indent=4, ensure_ascii=False))
+    else:
+        print(format_plan(plan))
+    return 0
+
+
+def run_restore(args):
+    try:
+        if args.list:
+            info = read_info(args.archive)
+            parts = {part["part_number"]: part["part_name"] for part in info["parts"]}
+            for entry in info.get("entries") or []:
+                first, last = entry["parts"]
+                print(f"{entry['size']:>14}  {parts.get(first, first)}..{parts.get(last, last)}  {entry['name']}")
+            return 0
+        if args.member:
+            restore_member(args.archive, args.member, args.output_dir, args.password)
+            return 0
+        results = restore_outputs(args.archive, args.output_dir, max(0, args.jobs), args.password, args.io_limit)
+        if args.json:
+            print(json.dumps([result.as_dict() for result in results], indent=4, ensure_ascii=False))
+        return 0 if all(result.ok for result in results) else 1
+    except (OSError, ValueError, RestoreError, subprocess.CalledProcessError) as e:
+        logging.error(f"Restore from {args.archive} failed: {e}")
+        return 1
+
+
+def run_verify(args):
+    if not os.path.isdir(args.output_dir):
+        logging.error(f"Output directory {args.output_dir} does not exist")
+        return 2
+    results = verify_outputs(args.output_dir, max(0, args.jobs), args.password, args.cache)
+    if args.json:
+        print(json.dumps([result.as_dict() for result in results], indent=4, ensure_ascii=False))
+    return 0 if all(result.ok for result in results) else 1
+
+
+def run_queue_add(args):
+    if args.password:
+        logging.error("Passwords are not stored in the queue, give --password to 'queue run' instead")
+        return 2
+    missing = [path for path in args.inputs if not os.path.exists(path)]
+    if missing:
+        logging.error(f"Input {', '.join(missing)} does not exist")
+        return 2
+    with JobQueue(args.queue) as queue:
+        ids = queue.enqueue(args.inputs, args.output_dir, size_threshold=args.size_threshold * MB, large_volume_size=args.large_volume_size * MB,
+                            small_volume_size=args.small_volume_size * MB, include_subdirs=args.subdirs, small_file_action=args.small_file_action,
+                            compression_level=args.level, max_workers=max(0, args.jobs), incremental=args.incremental, auto_level=args.auto_level,
+                            pack_size=args.small_volume_size * MB if args.pack else None, memory_budget=args.memory * MB if args.memory else None,
+                            backend=args.backend, checksums=list(args.checksums))
+    logging.info(f"Queued {len(ids)} jobs in {queue.path}")
+    return 0
+
+
+def run_queue_run(args):
+    with JobQueue(args.queue) as queue:
+        finished = run_queue(queue, max(1, args.jobs), args.password, progress=print_progress if args.progress else None, drain=not args.follow)
+    return 0 if not finished['failed'] else 1
+
+
+def run_queue_status(args):
+    with JobQueue(args.queue) as queue:
+        if args.state:
+            jobs = queue.jobs(args.state)
+            if args.json:
+                print(json.dumps(jobs, indent=4, ensure_ascii=False))
+            for job in [] if args.json else jobs:
+                print(f"{job['id']:>8}  {job['state']:8} {job['attempts']:>3}  {job['input']} -> {job['output_dir']}" + (f"  ({job['error']})" if job['error'] else ""))
+            return 0
+        counts = queue.counts()
+    if args.json:
+        print(json.dumps(counts, indent=4))
+    else:
+        print('  '.join(f"{state}: {count}" for state, count in counts.items()))
+    return 0
+
+
+def run_queue_retry(args):
+    with JobQueue(args.queue) as queue:
+        logging.info(f"{queue.retry_failed()} failed jobs queued again")
+    return 0
+
+
+def run_queue_purge(args):
+    with JobQueue(args.queue) as queue:
+        logging.info(f"{queue.purge_done()} finished jobs deleted")
+    return 0
+
+
+def run_watch(args):
+    missing = [path for path in args.inputs if not os.path.isdir(path)]
+    if missing:
+        logging.error(f"Watched directory {', '.join(missing)} does not exist")
+        return 2
+    options = dict(size_threshold=args.size_threshold * MB, large_volume_size=args.large_volume_size * MB, small_volume_size=args.small_volume_size * MB,
+                   include_subdirs=args.subdirs, small_file_action=args.small_file_action, compression_level=args.level, max_workers=max(0, args.jobs),
+                   incremental=args.incremental, auto_level=args.auto_level, pack_size=args.small_volume_size * MB if args.pack else None,
+                   memory_budget=args.memory * MB if args.memory else None, backend=args.backend, checksums=list(args.checksums))
+    try:
+        stats = watch_directories(args.inputs, args.output_dir, options, args.password, max(1, args.workers), args.backlog, args.settle,
+                                  args.poll, args.poll_interval, CancelToken(), print_progress if args.progress else None)
+    except ValueError as e:
+        logging.error(str(e))
+        return 2
+    except KeyboardInterrupt:
+        return 130
+    return 0 if not stats.failed else 1
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.WARNING if args.quiet else logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    set_language(args.lang)
+    configure_metrics(args.metrics_jsonl, args.metrics_prom)
+    if args.profile:
+        start_profiling(args.profile, args.cprofile, args.sample_ms / 1000 if args.sample_ms else None)
+    return args.handler(args)
@@ -0,0 +1,321 @@
+import os
+import json
+import hashlib
+import time
+import logging
+import subprocess
+from collections import Counter
+from .pool import run_jobs
+from .scanner import scan_tree, file_entry
+from .checksum import hash_files, DEFAULT_ALGORITHMS
+from .process import JobCancelled, staging_path, discard_output, publish_output, sweep_staging
+from .manifest import InputManifest, archive_target, entry_fingerprint
+from .sampler import auto_level as sampled_level
+from .packing import plan_packs, PackIndex
+from .memory import plan_memory, log_plan
+from .backends import get_backend, BackendError
+from .metrics import JobMetrics, metered, phase, note
+from .trace import span
+from .i18n import localize
+
+
+def split_and_compress_file(file_path, output_dir, volume_size, password=None, compression_level=1, threads=None, dictionary=None, backend=None, cancel=None, progress=None, checksums=DEFAULT_ALGORITHMS, total_bytes=None):
+    backend = get_backend(backend)
+    base_name = os.path.basename(file_path)
+    os.makedirs(output_dir, exist_ok=True)
+    archive_path = os.path.join(output_dir, base_name)
+    # Volumes and info.json go into a staging directory that is renamed to archive_path once complete, so an interrupted
+    # run never leaves half a volume set under the real name and old and new parts never mix
+    staging = staging_path(archive_path)
+    archive_name = os.path.join(staging, base_name + backend.extension)
+    discard_output(staging)
+    try:
+        os.makedirs(staging)
+        with phase('compress'):
+            written = backend.create([file_path], archive_name, volume_size, password, compression_level, threads, dictionary, cancel, progress, file_path, checksums=checksums or (), total_bytes=total_bytes)
+        if written is not None:
+            volumes = written.volumes()
+            entries = written.entries
+        else:
+            # The backend wrote its volumes itself, so they are found and hashed in a second pass
+            with span('list_parts', archive=archive_path):
+                part_file_paths = sorted(os.path.join(staging, f) for f in os.listdir(staging) if f.startswith(base_name + backend.extension))
+            with phase('hash'):
+                part_checksums = hash_files(part_file_paths, checksums) if checksums else {}
+            volumes = [(part_file, os.path.getsize(part_file), part_checksums.get(part_file, {})) for part_file in part_file_paths]
+            entries = []
+        note(archive=archive_path, output_bytes=sum(size for _, size, _ in volumes), volumes=len(volumes))
+
+        info_path = os.path.join(staging, "info.json")
+        with span('info_json', path=info_path):
+            info_data = {
+                "original_file_path": file_path,
+                "original_file_size": os.path.getsize(file_path),
+                "backend": backend.name,
+                "part_count": len(volumes),
+                "checksum_algorithms": list(checksums or ()),
+                "parts": [{"part_number": i+1, "part_name": os.path.basename(part_file), "part_size": size, "checksums": part_checksums} for i, (part_file, size, part_checksums) in enumerate(volumes)],
+                # Byte range and parts of every archive member, so restore can fetch one member from only the parts it needs
+                "entries": entries
+            }
+            with open(info_path, 'w') as info_file:
+                json.dump(info_data, info_file, indent=4)
+        publish_output(staging, archive_path)
+
+        logging.info(localize('file_split_compressed', file_path=file_path, archive_path=archive_path, part_count=len(volumes)))
+        return True
+    except JobCancelled:
+        discard_output(staging)
+        logging.warning(localize('compress_cancelled', file_path=file_path))
+        return False
+    except (BackendError, OSError, subprocess.CalledProcessError) as e:
+        discard_output(staging)
+        logging.error(localize('failed_compress', file_path=file_path, error=e))
+        return False
+
+
+def compress_file(file_path, output_dir, password=None, compression_level=1, threads=None, dictionary=None, backend=None, cancel=None, progress=None, total_bytes=None):
+    backend = get_backend(backend)
+    base_name = os.path.basename(file_path)
+    archive_name = os.path.join(output_dir, base_name + backend.extension)
+    # Written under a staging name and renamed over archive_name, which never holds a partial archive
+    staging = staging_path(archive_name)
+    discard_output(staging)
+    try:
+        with phase('compress'):
+            backend.create([file_path], staging, None, password, compression_level, threads, dictionary, cancel, progress, file_path, total_bytes=total_bytes)
+        publish_output(staging, archive_name)
+        note(archive=archive_name, output_bytes=os.path.getsize(archive_name), volumes=1)
+        logging.info(localize('file_compressed', file_path=file_path, archive_name=archive_name))
+        return True
+    except JobCancelled:
+        discard_output(staging)
+        logging.warning(localize('compress_cancelled', file_path=file_path))
+        return False
+    except (BackendError, OSError, subprocess.CalledProcessError) as e:
+        discard_output(staging)
+        logging.error(localize('failed_compress', file_path=file_path, error=e))
+        return False
+
+
+def compress_pack(file_paths, archive_name, password=None, compression_level=1, threads=None, dictionary=None, backend=None, cancel=None, progress=None, total_bytes=None):
+    # Several inputs into one archive
+    backend = get_backend(backend)
+    staging = staging_path(archive_name)
+    discard_output(staging)
+    try:
+        with phase('compress'):
+            backend.create(file_paths, staging, None, password, compression_level, threads, dictionary, cancel, progress, archive_name, total_bytes=total_bytes)
+        publish_output(staging, archive_name)
+        note(archive=archive_name, output_bytes=os.path.getsize(archive_name), volumes=1)
+        logging.info(localize('files_packed', count=len(file_paths), archive_name=archive_name))
+        return True
+    except JobCancelled:
+        discard_output(staging)
+        logging.warning(localize('compress_cancelled', file_path=archive_name))
+        return False
+    except (BackendError, OSError, subprocess.CalledProcessError) as e:
+        discard_output(staging)
+        logging.error(localize('failed_compress', file_path=archive_name, error=e))
+        return False
+
+
+def pack_level(members):
+    # members: (entry, level) pairs; the pack uses the level chosen for most of its bytes
+    levels = Counter()
+    for entry, level in members:
+        levels[level] += entry.size
+    return levels.most_common(1)[0][0]
+
+
+def compress_packed_entries(members, output_dir, number, archive, pack_index, manifest, password=None, threads=None, dictionary=None, backend=None, cancel=None, progress=None, batch=None):
+    archive_name = os.path.join(output_dir, archive)
+    level = pack_level(members)
+    start = time.perf_counter()
+    if not compress_pack([entry.path for entry, _ in members], archive_name, password, level, threads, dictionary, backend, cancel, progress,
+                         sum(entry.size for entry, _ in members)):
+        return False
+    pack_index.add(number, archive, [{"path": os.path.abspath(entry.path), "name": entry.name, "size": entry.size} for entry, _ in members])
+    if manifest is not None:
+        with phase('manifest'):
+            for entry, _ in members:
+                manifest.record(entry.path, entry.size, entry.mtime, entry_fingerprint(entry), archive_name)
+                if batch is not None:
+                    manifest.checkpoint(batch, entry.path, archive_name)
+        manifest.record_run(level, threads or 1, sum(entry.size for entry, _ in members), os.path.getsize(archive_name), time.perf_counter() - start)
+    return True
+
+
+def plan_pack_archives(items, pack_size, pack_index, extension='.7z'):
+    # items: (size, (entry, level)); every packed input goes through the pack index, even when its bin holds only itself
+    packs = plan_packs(items, pack_size)
+    return [(number, archive, [payload for size, payload in pack]) for (number, archive), pack in zip(pack_index.next_archive_names(len(packs), extension), packs)]
+
+
+def select_job(file_path, size, output_dir, size_threshold, large_volume_size, small_volume_size, small_file_action, password, compression_level, threads=None, cancel=None, progress=None, dictionary=None, backend=None, checksums=DEFAULT_ALGORITHMS):
+    # size comes from the scan and doubles as the progress total, so the backend never walks the input again
+    if size > size_threshold:
+        return split_and_compress_file, (file_path, output_dir, large_volume_size, password, compression_level, threads, dictionary, backend, cancel, progress, checksums, size)
+    if small_file_action == "compress":
+        return compress_file, (file_path, output_dir, password, compression_level, threads, dictionary, backend, cancel, progress, size)
+    return split_and_compress_file, (file_path, output_dir, small_volume_size, password, compression_level, threads, dictionary, backend, cancel, progress, checksums, size)
+
+
+def skip_unchanged(manifest, entry):
+    # True when the manifest says the input has not changed since it was last archived
+    with span('manifest_check', path=entry.path):
+        unchanged = manifest.unchanged(entry.path, entry.size, entry.mtime, lambda: entry_fingerprint(entry))
+    if unchanged:
+        logging.info(localize('skip_unchanged', file_path=entry.path))
+        return True
+    return False
+
+
+def skip_finished(manifest, batch, entry):
+    # True when an interrupted run of the same batch already archived the input and it has not changed since
+    if manifest.checkpointed(batch, entry.path) is None:
+        return False
+    with span('manifest_check', path=entry.path):
+        unchanged = manifest.unchanged(entry.path, entry.size, entry.mtime, lambda: entry_fingerprint(entry))
+    if unchanged:
+        logging.info(localize('skip_finished', file_path=entry.path))
+    return unchanged
+
+
+def leave_pack(pack_index, path, func):
+    # An input that used to be packed and is now archived on its own leaves its old pack once the new archive exists
+    def run(*args, **kwargs):
+        ok = func(*args, **kwargs)
+        if ok:
+            pack_index.discard([path])
+        return ok
+    run.__name__ = getattr(func, '__name__', 'job')
+    return run
+
+
+def batch_key(directory, output_dir, *settings):
+    # Identifies a batch by its input, output and every setting that shapes the archives, so only a rerun of the same
+    # batch resumes from its checkpoints
+    key = json.dumps([os.path.abspath(directory), os.path.abspath(output_dir)] + list(settings))
+    return hashlib.sha1(key.encode('utf-8', 'surrogateescape')).hexdigest()
+
+
+def track_job(manifest, entry, output_dir, func, level=None, threads=None, extension='.7z', batch=None):
+    return manifest.tracked(entry, archive_target(entry.path, output_dir, func is split_and_compress_file, extension), func, level, threads, batch)
+
+
+def job_metrics(input_path, size, backend, job, scan_seconds=0.0, manifest_seconds=0.0):
+    metrics = JobMetrics(job.name, input_path, size, backend.name, job.level, job.threads, job.dictionary)
+    metrics.phases['scan'] = scan_seconds
+    metrics.phases['manifest'] = manifest_seconds
+    return metrics
+
+
+def process_directory(directory, output_dir, size_threshold, large_volume_size, small_volume_size, include_subdirs, small_file_action, password, compression_level, max_workers=1, incremental=True, cancel=None, progress=None, auto_level=False, pack_size=None, memory_budget=None, backend=None, checksums=DEFAULT_ALGORITHMS):
+    backend = get_backend(backend)
+    manifest = None
+    sweep_staging(output_dir)
+    try:
+        scan_started = time.perf_counter()
+        # File lists feed the fingerprints that both the manifest and the batch checkpoints compare against
+        index = scan_tree(directory)
+        scan_seconds = time.perf_counter() - scan_started
+        manifest = InputManifest(output_dir)
+        # Incremental runs resume through the manifest anyway; a full run checkpoints each finished input instead, so
+        # restarting it after an interruption only redoes the inputs that had not finished
+        batch = None if incremental else batch_key(directory, output_dir, size_threshold, large_volume_size, small_volume_size, include_subdirs,
+                                                   small_file_action, compression_level, auto_level, pack_size, backend.name, list(checksums or ()))
+        if include_subdirs:
+            # Packing also picks up loose top-level files, which would otherwise be left out
+            entries = index.dirs() + index.files() if pack_size else index.dirs()
+        else:
+            entries = [index.as_entry()]
+        pack_index = PackIndex(output_dir, os.path.basename(os.path.normpath(directory))) if include_subdirs and pack_size else None
+        direct = []
+        packable = []
+        checked = {}
+        unchanged = {}
+        for entry in entries:
+            check_started = time.perf_counter()
+            unchanged[entry.path] = skip_unchanged(manifest, entry) if incremental else skip_finished(manifest, batch, entry)
+            checked[entry.path] = time.perf_counter() - check_started
+        packed = {}
+        stale = set()
+        if pack_index is not None:
+            # A pack is replaced as a whole once any input in it changed or was removed: its other members are packed
+            # again with the changed ones, and the old pack is deleted when it has no current member left
+            stale = pack_index.prune(entry.path for entry in entries)
+            packed = pack_index.locations()
+            stale.update(packed[os.path.abspath(entry.path)] for entry in entries
+                         if not unchanged[entry.path] and os.path.abspath(entry.path) in packed)
+        for entry in entries:
+            archive = packed.get(os.path.abspath(entry.path))
+            if unchanged[entry.path]:
+                if archive not in stale:
+                    continue
+                logging.info(localize('pack_repacked', file_path=entry.path, archive=archive))
+            level = sampled_level(entry, compression_level) if auto_level else compression_level
+            if pack_index is not None and entry.size <= size_threshold and small_file_action == "compress":
+                packable.append((entry.size, (entry, level)))
+            else:
+                direct.append((entry, level))
+        packs = plan_pack_archives(packable, pack_size, pack_index, backend.extension) if packable else []
+
+        # Dictionary, -mmt and the number of concurrent 7z processes all come out of one memory plan
+        plan = plan_memory([(entry.name, entry.size, level) for entry, level in direct] +
+                           [(archive, sum(entry.size for entry, _ in members), pack_level(members)) for number, archive, members in packs],
+                           memory_budget, max_workers if include_subdirs else 1)
+        log_plan(plan)
+        jobs = []
+        for (entry, level), job in zip(direct, plan.jobs):
+            func, args = select_job(entry.path, entry.size, output_dir, size_threshold, large_volume_size, small_volume_size, small_file_action, password, level, job.threads, cancel, progress, job.dictionary, backend, checksums)
+            func = track_job(manifest, entry, output_dir, func, level, job.threads, backend.extension, batch)
+            if os.path.abspath(entry.path) in packed:
+                func = leave_pack(pack_index, entry.path, func)
+            metrics = job_metrics(entry.path, entry.size, backend, job, entry.scan_seconds if include_subdirs else scan_seconds, checked[entry.path])
+            jobs.append((entry.size, metered(metrics, func), args))
+        for (number, archive, members), job in zip(packs, plan.jobs[len(direct):]):
+            metrics = job_metrics(os.path.join(output_dir, archive), job.size, backend, job, sum(entry.scan_seconds for entry, _ in members),
+                                  sum(checked[entry.path] for entry, _ in members))
+            jobs.append((job.size, metered(metrics, compress_packed_entries), (members, output_dir, number, archive, pack_index, manifest, password, job.threads, job.dictionary, backend, cancel, progress, batch)))
+        ok = all(run_jobs(jobs, plan.workers, cancel))
+        if ok and batch is not None:
+            manifest.clear_checkpoints(batch)
+        return ok
+    except Exception as e:
+        logging.error(f"Failed to process directory {directory}: {e}")
+        return False
+    finally:
+        if manifest is not None:
+            manifest.close()
+
+
+def planned_job(entry, output_dir, size_threshold, large_volume_size, small_volume_size, small_file_action, password, level, memory_budget, backend, cancel, progress, checksums=DEFAULT_ALGORITHMS):
+    plan = plan_memory([(entry.name, entry.size, level)], memory_budget)
+    log_plan(plan)
+    job = plan.jobs[0]
+    func, args = select_job(entry.path, entry.size, output_dir, size_threshold, large_volume_size, small_volume_size, small_file_action, password, level, job.threads, cancel, progress, job.dictionary, backend, checksums)
+    return func, args, job
+
+
+def copy_file(file_path, output_dir, size_threshold, large_volume_size, small_volume_size, small_file_action, password, compression_level, incremental=True, cancel=None, progress=None, auto_level=False, memory_budget=None, backend=None, checksums=DEFAULT_ALGORITHMS):
+    backend = get_backend(backend)
+    sweep_staging(output_dir)
+    try:
+        entry = file_entry(file_path)
+        if not incremental:
+            level = sampled_level(entry, compression_level) if auto_level else compression_level
+            func, args, job = planned_job(entry, output_dir, size_threshold, large_volume_size, small_volume_size, small_file_action, password, level, memory_budget, backend, cancel, progress, checksums)
+            return metered(job_metrics(file_path, entry.size, backend, job), func)(*args)
+        with InputManifest(output_dir) as manifest:
+            check_started = time.perf_counter()
+            if skip_unchanged(manifest, entry):
+                return True
+            manifest_seconds = time.perf_counter() - check_started
+            level = sampled_level(entry, compression_level) if auto_level else compression_level
+            func, args, job = planned_job(entry, output_dir, size_threshold, large_volume_size, small_volume_size, small_file_action, password, level, memory_budget, backend, cancel, progress, checksums)
+            func = track_job(manifest, entry, output_dir, func, level, job.threads, backend.extension)
+            return metered(job_metrics(file_path, entry.size, backend, job, manifest_seconds=manifest_seconds), func)(*args)
+    except Exception as e:
+        logging.error(localize('failed_copy', file_path=file_path, error=e))
+        return False
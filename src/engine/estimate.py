@@ -0,0 +1,200 @@
+import os
+import heapq
+from .scanner import scan_tree, file_entry
+from .manifest import InputManifest, MANIFEST_NAME, entry_fingerprint
+from .sampler import sample_ratio, choose_level
+from .packing import plan_packs, PackIndex
+from .memory import plan_memory, MB
+from .backends import get_backend
+from .compressor import select_job, pack_level, split_and_compress_file
+
+# Single-thread 7z speed in MB/s per -mx level, used until the manifest has runs at that level
+DEFAULT_THROUGHPUT = {0: 400, 1: 40, 2: 30, 3: 20, 4: 15, 5: 6, 6: 5, 7: 4, 8: 3, 9: 2.5}
+# How much further LZMA2 gets than the zlib level 1 trial the sampler runs, applied to the compressible share only
+LEVEL_GAIN = {0: 1.0, 1: 0.92, 2: 0.9, 3: 0.88, 4: 0.86, 5: 0.82, 6: 0.81, 7: 0.8, 8: 0.79, 9: 0.78}
+ARCHIVE_OVERHEAD = 1024
+
+
+class InputPlan:
+    def __init__(self, name, path, size, action, level=None, ratio=1.0, output_bytes=0, volume_size=None, volumes=0,
+                 dictionary=None, threads=None, seconds=0.0, members=None):
+        self.name = name
+        self.path = path
+        self.size = size
+        self.action = action  # 'split', 'compress', 'pack' or 'skip'
+        self.level = level
+        self.ratio = ratio
+        self.output_bytes = output_bytes
+        self.volume_size = volume_size
+        self.volumes = volumes
+        self.dictionary = dictionary
+        self.threads = threads
+        self.seconds = seconds
+        self.members = members or []
+
+    def as_dict(self):
+        return dict(self.__dict__)
+
+
+class RunPlan:
+    def __init__(self, input_path, output_dir, inputs, memory_plan=None, wall_seconds=0.0):
+        self.input_path = input_path
+        self.output_dir = output_dir
+        self.inputs = inputs
+        self.memory_plan = memory_plan
+        self.wall_seconds = wall_seconds
+
+    @property
+    def input_bytes(self):
+        return sum(item.size for item in self.inputs if item.action != 'skip')
+
+    @property
+    def output_bytes(self):
+        return sum(item.output_bytes for item in self.inputs)
+
+    @property
+    def volumes(self):
+        return sum(item.volumes for item in self.inputs)
+
+    def as_dict(self):
+        return {
+            "input_path": self.input_path,
+            "output_dir": self.output_dir,
+            "input_bytes": self.input_bytes,
+            "output_bytes": self.output_bytes,
+            "volumes": self.volumes,
+            "wall_seconds": self.wall_seconds,
+            "workers": self.memory_plan.workers if self.memory_plan else 0,
+            "peak_memory": self.memory_plan.peak if self.memory_plan else 0,
+            "memory_budget": self.memory_plan.budget if self.memory_plan else 0,
+            "inputs": [item.as_dict() for item in self.inputs]
+        }
+
+
+def estimate_ratio(sampled, level):
+    if level == 0:
+        return 1.0
+    gain = LEVEL_GAIN.get(level, 1.0)
+    return max(0.0, min(1.0, sampled - (1 - gain) * (1 - sampled)))
+
+
+def throughput(level, threads, history):
+    # history: {level: (bytes per thread-second, ratio) or None} read from the manifest
+    measured = history.get(level)
+    per_thread = measured[0] if measured else DEFAULT_THROUGHPUT.get(level, DEFAULT_THROUGHPUT[9]) * MB
+    return per_thread * max(1, threads or 1)
+
+
+def schedule(durations, workers):
+    # Same order as run_jobs: largest first, each job on the worker that frees up first
+    slots = [0.0] * max(1, workers)
+    for duration in sorted(durations, reverse=True):
+        heapq.heappush(slots, heapq.heappop(slots) + duration)
+    return max(slots)
+
+
+def format_size(size):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if abs(size) < 1024:
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+def format_duration(seconds):
+    seconds = int(round(seconds))
+    return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+def open_history(output_dir):
+    # Read-only use of an existing manifest; planning must not create the output directory
+    if not os.path.exists(os.path.join(output_dir, MANIFEST_NAME)):
+        return None
+    return InputManifest(output_dir)
+
+
+def plan_run(input_path, output_dir, size_threshold, large_volume_size, small_volume_size, include_subdirs, small_file_action,
+             compression_level, max_workers=1, incremental=True, auto_level=False, pack_size=None, memory_budget=None, backend=None):
+    # Mirrors process_directory/copy_file decisions without launching 7z
+    if os.path.isdir(input_path):
+        index = scan_tree(input_path)
+        if include_subdirs:
+            entries = index.dirs() + index.files() if pack_size else index.dirs()
+        else:
+            entries = [index.as_entry()]
+    else:
+        include_subdirs = False
+        entries = [file_entry(input_path)]
+    packing = include_subdirs and bool(pack_size)
+
+    manifest = open_history(output_dir)
+    try:
+        history = {level: manifest.history(level) for level in range(10)} if manifest is not None else {}
+        skipped = []
+        direct = []
+        packable = []
+        for entry in entries:
+            if incremental and manifest is not None and manifest.unchanged(entry.path, entry.size, entry.mtime, lambda: entry_fingerprint(entry)):
+                skipped.append(InputPlan(entry.name, entry.path, entry.size, 'skip'))
+                continue
+            sampled = sample_ratio(entry)
+            level = choose_level(sampled, compression_level) if auto_level else compression_level
+            if packing and entry.size <= size_threshold and small_file_action == "compress":
+                packable.append((entry.size, (entry, level, sampled)))
+            else:
+                direct.append((entry, level, sampled))
+    finally:
+        if manifest is not None:
+            manifest.close()
+
+    packs = plan_packs(packable, pack_size) if packable else []
+    pack_names = PackIndex(output_dir, os.path.basename(os.path.normpath(input_path))).next_archive_names(len(packs), get_backend(backend).extension) if packs else []
+    units = [(entry.name, entry.size, level) for entry, level, sampled in direct]
+    for (number, archive), pack in zip(pack_names, packs):
+        units.append((archive, sum(size for size, payload in pack), pack_level([(entry, level) for size, (entry, level, sampled) in pack])))
+    memory_plan = plan_memory(units, memory_budget, max_workers if include_subdirs else 1) if units else None
+
+    inputs = []
+    for (entry, level, sampled), job in zip(direct, memory_plan.jobs if memory_plan else []):
+        func, args = select_job(entry.path, entry.size, output_dir, size_threshold, large_volume_size, small_volume_size, small_file_action, None, level)
+        ratio = estimate_ratio(sampled, level)
+        output_bytes = int(entry.size * ratio) + ARCHIVE_OVERHEAD
+        if func is split_and_compress_file:
+            volume_size = args[2]
+            item = InputPlan(entry.name, entry.path, entry.size, 'split', level, ratio, output_bytes, volume_size,
+                             max(1, -(-output_bytes // volume_size)), job.dictionary, job.threads)
+        else:
+            item = InputPlan(entry.name, entry.path, entry.size, 'compress', level, ratio, output_bytes, None, 1, job.dictionary, job.threads)
+        item.seconds = entry.size / throughput(level, job.threads, history)
+        inputs.append(item)
+    for ((number, archive), pack), job in zip(zip(pack_names, packs), memory_plan.jobs[len(direct):] if memory_plan else []):
+        output_bytes = sum(int(size * estimate_ratio(sampled, job.level)) for size, (entry, level, sampled) in pack) + ARCHIVE_OVERHEAD
+        item = InputPlan(archive, os.path.join(output_dir, archive), job.size, 'pack', job.level, output_bytes / max(1, job.size), output_bytes,
+                         None, 1, job.dictionary, job.threads, members=[entry.path for size, (entry, level, sampled) in pack])
+        item.seconds = job.size / throughput(job.level, job.threads, history)
+        inputs.append(item)
+
+    wall_seconds = schedule([item.seconds for item in inputs], memory_plan.workers) if memory_plan else 0.0
+    return RunPlan(input_path, output_dir, inputs + skipped, memory_plan, wall_seconds)
+
+
+def format_plan(plan):
+    header = ("Input", "Action", "Level", "Size", "Ratio", "Output", "Volumes", "Dict", "Threads", "Time")
+    rows = [header]
+    for item in plan.inputs:
+        name = item.name if not item.members else f"{item.name} ({len(item.members)} inputs)"
+        if item.action == 'skip':
+            rows.append((name, 'skip', '', format_size(item.size), '', '', '', '', '', ''))
+            continue
+        rows.append((name, item.action, str(item.level), format_size(item.size), f"{item.ratio:.2f}", format_size(item.output_bytes),
+                     str(item.volumes), f"{item.dictionary // MB}m", str(item.threads), format_duration(item.seconds)))
+    widths = [max(len(row[i]) for row in rows) for i in range(len(header))]
+    lines = ["  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip() for row in rows]
+    lines.insert(1, "  ".join("-" * width for width in widths))
+    memory_plan = plan.memory_plan
+    lines.append("")
+    lines.append(f"Total: {format_size(plan.input_bytes)} in, about {format_size(plan.output_bytes)} out in {plan.volumes} volumes, "
+                 f"wall time about {format_duration(plan.wall_seconds)}")
+    if memory_plan is not None:
+        lines.append(f"Parallel jobs: {memory_plan.workers}, peak memory about {format_size(memory_plan.peak)} of {format_size(memory_plan.budget)}")
+    return "\n".join(lines)
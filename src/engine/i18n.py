@@ -0,0 +1,150 @@
+# Language dictionary for localization, shared by the engine log messages and both front ends
+LANG = {
+    'en': {
+        'switch_language': "Switch Language",
+        'success': "Success",
+        'error': "Error",
+        'file_compressed': "File {file_path} compressed into {archive_name}",
+        'file_split_compressed': "File {file_path} is too large, split and compressed into {archive_path} with {part_count} parts",
+        'failed_compress': "Failed to compress {file_path} with error: {error}",
+        'failed_copy': "Failed to copy {file_path} due to {error}",
+        'compress_cancelled': "Compression of {file_path} was cancelled, partial output removed",
+        'skip_unchanged': "{file_path} is unchanged since the last run, skipped",
+        'skip_finished': "{file_path} was already archived before this batch was interrupted, skipped",
+        'staging_swept': "Removed {path}, left behind by an interrupted run",
+        'files_packed': "{count} inputs packed into {archive_name}",
+        'pack_repacked': "{file_path} is unchanged but is packed again because {archive} is being replaced",
+        'pack_retired': "{archive} no longer holds any current input and was deleted",
+        'auto_level': "{file_path}: sampled compression ratio {ratio}, using level {level} (requested {requested})",
+        'memory_plan': "Memory plan: {jobs} jobs, {workers} at a time, peak about {peak} MB of a {budget} MB budget",
+        'memory_plan_job': "  {name}: dictionary {dictionary} MB, {threads} threads, about {memory} MB",
+        'memory_over_budget': "Even the smallest settings need about {peak} MB, more than the {budget} MB budget",
+        'member_restored': "{member} restored to {target}, read {read} of {part_count} parts",
+        'member_not_found': "{member} is not in the volume index of {archive_path}",
+        'archive_verified': "{archive} verified",
+        'archive_invalid': "{archive} failed verification: {error}",
+        'verify_summary': "Verified {count} archives in {seconds}s: {failed} failed, {cached} unchanged since they last passed",
+        'archive_restore_failed': "Failed to restore {archive}: {error}",
+        'restore_summary': "Restored {count} archives ({size} MB) in {seconds}s, {throughput} MB/s, {failed} failed",
+        'queue_job_started': "Queue job {id}: {input} (attempt {attempt})",
+        'queue_job_failed': "Queue job {id} for {input} failed: {error}",
+        'queue_job_retry': "Queue job {id} for {input} failed on attempt {attempt} of {max_attempts}, queued to retry: {error}",
+        'queue_finished': "Queue runner stopped: {done} jobs done, {failed} failed, {queued} still queued",
+        'queue_lease_lost': "Queue job {id} for {input} lost its lease to another worker, its result was not recorded",
+        'watch_started': "Watching {directories} ({mode}), archiving into {output_dir}",
+        'watch_queued': "{input} has settled, queued for archiving",
+        'watch_archived': "{input} archived {seconds}s after it last changed",
+        'watch_failed': "Failed to archive {input}: {error}",
+        'watch_backlog_full': "Backlog of {backlog} inputs is full, holding new inputs until a worker is free",
+        'select_input': "Please select an input file or directory.",
+        'output_dir_not_exist': "Output directory does not exist.",
+        'input_file': "Input File",
+        'input_directory': "Input Directory",
+        'output_directory': "Output Directory:",
+        'size_threshold': "Size Threshold (MB):",
+        'large_volume_size': "Large Volume Size (MB):",
+        'small_volume_size': "Small Volume Size (MB):",
+        'compress_subdirs': "Compress Each Subdirectory Separately",
+        'skip_unchanged_inputs': "Skip Unchanged Inputs",
+        'auto_level_inputs': "Store Incompressible Inputs",
+        'pack_small_inputs': "Pack Small Subdirectories Together",
+        'small_file_action': "Action for Small Files:",
+        'compress': "Compress",
+        'split_compress': "Split and Compress",
+        'password': "Password (Optional):",
+        'compression_level': "Compression Level (0-9):",
+        'parallel_jobs': "Parallel Jobs:",
+        'volume_checksums': "Volume Checksums (md5, sha256, blake2b):",
+        'start': "Start",
+        'cancel': "Cancel",
+        'status_idle': "Idle",
+        'status_running': "Running {name} ({queued} queued)",
+        'status_finished': "Finished {name}",
+        'status_failed': "Failed {name}",
+        'status_cancelled': "Cancelled",
+        'finished': "Finished"
+    },
+    'zh': {
+        'switch_language': "切换语言",
+        'success': "成功",
+        'error': "错误",
+        'file_compressed': "文件 {file_path} 压缩到 {archive_name}",
+        'file_split_compressed': "文件 {file_path} 太大，分割并压缩到 {archive_path}，共 {part_count} 个部分",
+        'failed_compress': "压缩 {file_path} 失败，错误: {error}",
+        'failed_copy': "复制 {file_path} 失败，错误: {error}",
+        'compress_cancelled': "已取消压缩 {file_path}，不完整的输出已删除",
+        'skip_unchanged': "{file_path} 自上次运行以来未改变，已跳过",
+        'skip_finished': "{file_path} 在本批次中断前已压缩，已跳过",
+        'staging_swept': "已删除中断的运行遗留的 {path}",
+        'files_packed': "{count} 个输入已合并压缩到 {archive_name}",
+        'pack_repacked': "{file_path} 未改变, 但 {archive} 将被替换, 因此重新合并压缩",
+        'pack_retired': "{archive} 已不包含任何当前输入, 已删除",
+        'auto_level': "{file_path}: 采样压缩率 {ratio}，使用级别 {level}（请求级别 {requested}）",
+        'memory_plan': "内存计划: {jobs} 个任务，同时运行 {workers} 个，峰值约 {peak} MB，预算 {budget} MB",
+        'memory_plan_job': "  {name}: 字典 {dictionary} MB，{threads} 个线程，约 {memory} MB",
+        'memory_over_budget': "即使使用最小设置也需要约 {peak} MB，超过 {budget} MB 的预算",
+        'member_restored': "{member} 已恢复到 {target}，读取了 {part_count} 个部分中的 {read} 个",
+        'member_not_found': "{archive_path} 的分卷索引中没有 {member}",
+        'archive_verified': "{archive} 校验通过",
+        'archive_invalid': "{archive} 校验失败: {error}",
+        'verify_summary': "{seconds} 秒内校验了 {count} 个归档: {failed} 个失败, {cached} 个自上次通过后未改变",
+        'archive_restore_failed': "恢复 {archive} 失败: {error}",
+        'restore_summary': "{seconds} 秒内恢复了 {count} 个归档 ({size} MB)，{throughput} MB/s，{failed} 个失败",
+        'queue_job_started': "队列任务 {id}: {input} (第 {attempt} 次尝试)",
+        'queue_job_failed': "队列任务 {id} ({input}) 失败: {error}",
+        'queue_job_retry': "队列任务 {id} ({input}) 第 {attempt}/{max_attempts} 次尝试失败, 已重新排队: {error}",
+        'queue_finished': "队列处理已停止: {done} 个任务完成, {failed} 个失败, 还有 {queued} 个排队",
+        'queue_lease_lost': "队列任务 {id} ({input}) 的租约已被其他工作线程接管, 结果未被记录",
+        'watch_started': "正在监视 {directories} ({mode}), 压缩到 {output_dir}",
+        'watch_queued': "{input} 已写入完成, 等待压缩",
+        'watch_archived': "{input} 已压缩, 距最后一次修改 {seconds} 秒",
+        'watch_failed': "压缩 {input} 失败: {error}",
+        'watch_backlog_full': "{backlog} 个输入的待处理队列已满, 新输入将等待空闲的工作线程",
+        'select_input': "请选择一个输入文件或目录。",
+        'output_dir_not_exist': "输出目录不存在。",
+        'input_file': "输入文件",
+        'input_directory': "输入目录",
+        'output_directory': "输出目录:",
+        'size_threshold': "大小阈值 (MB):",
+        'large_volume_size': "大卷大小 (MB):",
+        'small_volume_size': "小卷大小 (MB):",
+        'compress_subdirs': "单独压缩每个子目录",
+        'skip_unchanged_inputs': "跳过未改变的输入",
+        'auto_level_inputs': "直接存储不可压缩的输入",
+        'pack_small_inputs': "合并压缩小的子目录",
+        'small_file_action': "小文件的操作:",
+        'compress': "压缩",
+        'split_compress': "分割并压缩",
+        'password': "密码 (可选):",
+        'compression_level': "压缩级别 (0-9):",
+        'parallel_jobs': "并行任务数:",
+        'volume_checksums': "分卷校验和 (md5, sha256, blake2b):",
+        'start': "开始",
+        'cancel': "取消",
+        'status_idle': "空闲",
+        'status_running': "正在处理 {name}（队列中 {queued} 个）",
+        'status_finished': "已完成 {name}",
+        'status_failed': "失败 {name}",
+        'status_cancelled': "已取消",
+        'finished': "已完成"
+    }
+}
+
+LANGUAGES = tuple(LANG)
+
+current_lang = 'en'
+
+
+def localize(key, **kwargs):
+    return LANG[current_lang].get(key, key).format(**kwargs)
+
+
+def set_language(lang):
+    global current_lang
+    if lang not in LANG:
+        raise ValueError(f"Unsupported language: {lang}")
+    current_lang = lang
+
+
+def get_language():
+    return current_lang
@@ -0,0 +1,280 @@
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import logging
+import threading
+from .compressor import copy_file, process_directory
+from .checksum import DEFAULT_ALGORITHMS
+from .i18n import localize
+
+QUEUE_NAME = "meowcat_queue.db"
+# A running job holds its lease for this long and renews it while it runs; a lease that runs out means the worker died
+LEASE_SECONDS = 60
+MAX_ATTEMPTS = 3
+# A failed job waits this long times its attempt count before it can be claimed again
+RETRY_DELAY = 10
+IDLE_POLL = 1.0
+STATES = ('queued', 'running', 'done', 'failed')
+
+# Options a job carries, with their defaults; the password is never written to the queue and comes from the runner
+JOB_OPTIONS = {
+    "size_threshold": 25 * 1024 * 1024,
+    "large_volume_size": 25 * 1024 * 1024,
+    "small_volume_size": 25 * 1024 * 1024,
+    "include_subdirs": False,
+    "small_file_action": "compress",
+    "compression_level": 1,
+    "max_workers": 1,
+    "incremental": True,
+    "auto_level": False,
+    "pack_size": None,
+    "memory_budget": None,
+    "backend": None,
+    "checksums": list(DEFAULT_ALGORITHMS)
+}
+
+
+def default_queue_path():
+    # The per-user data directory, so the queue outlives any one output directory
+    if sys.platform == 'win32':
+        base = os.environ.get('APPDATA') or os.path.expanduser('~')
+        return os.path.join(base, 'MeowCatCompress', QUEUE_NAME)
+    base = os.environ.get('XDG_DATA_HOME') or os.path.join(os.path.expanduser('~'), '.local', 'share')
+    return os.path.join(base, 'meowcatcompress', QUEUE_NAME)
+
+
+class QueuedJob:
+    def __init__(self, id, input_path, output_dir, options, attempts, worker=None):
+        self.id = id
+        self.input_path = input_path
+        self.output_dir = output_dir
+        self.options = options
+        self.attempts = attempts
+        # The claim this job is held under; updates from an older claim of the same job are ignored
+        self.worker = worker
+
+
+class JobQueue:
+    # Durable FIFO of compression jobs. Every state change is one SQLite transaction, and a job is only marked done
+    # after it succeeded, so a crash at any point means the job runs again: at-least-once, never lost.
+    def __init__(self, path=None):
+        self.path = path or default_queue_path()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.worker = f"{socket.gethostname()}:{os.getpid()}"
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30, isolation_level=None)
+        # WAL lets a status query read while a runner in another process writes
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, input TEXT, output_dir TEXT, options TEXT, state TEXT, attempts INTEGER, "
+            "worker TEXT, lease_until REAL, error TEXT, created REAL, updated REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, id)")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _transaction(self, statements):
+        # BEGIN IMMEDIATE takes the write lock up front, so two runners can never claim the same job
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = statements(self._conn)
+                self._conn.execute("COMMIT")
+                return result
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def enqueue(self, inputs, output_dir, **options):
+        unknown = set(options) - set(JOB_OPTIONS)
+        if unknown:
+            raise ValueError(f"Unknown job options: {', '.join(sorted(unknown))}")
+        options = json.dumps(dict(JOB_OPTIONS, **options))
+        now = time.time()
+        rows = [(os.path.abspath(path), os.path.abspath(output_dir), options, 'queued', 0, now, now) for path in inputs]
+
+        def insert(conn):
+            return [conn.execute("INSERT INTO jobs (input, output_dir, options, state, attempts, created, updated) VALUES (?, ?, ?, ?, ?, ?, ?)", row).lastrowid
+                    for row in rows]
+        return self._transaction(insert)
+
+    def claim(self, lease=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+        # The oldest queued job, or a running one whose worker stopped renewing its lease. A job whose lease ran out on
+        # its last attempt has probably been killing its workers, so it fails instead of being handed out again.
+        now = time.time()
+        worker = f"{self.worker}:{uuid.uuid4().hex[:12]}"
+
+        def take(conn):
+            while True:
+                row = conn.execute(
+                    "SELECT id, input, output_dir, options, attempts, state FROM jobs "
+                    "WHERE (state = 'queued' AND (lease_until IS NULL OR lease_until <= ?)) OR (state = 'running' AND lease_until < ?) "
+                    "ORDER BY id LIMIT 1", (now, now)
+                ).fetchone()
+                if row is None:
+                    return None
+                if row[5] == 'running' and row[4] >= max_attempts:
+                    conn.execute("UPDATE jobs SET state = 'failed', error = ?, lease_until = NULL, updated = ? WHERE id = ?",
+                                 (f"lease expired on each of {row[4]} attempts", now, row[0]))
+                    logging.error(localize('queue_job_failed', id=row[0], input=row[1], error=f"lease expired on each of {row[4]} attempts"))
+                    continue
+                conn.execute("UPDATE jobs SET state = 'running', attempts = attempts + 1, worker = ?, lease_until = ?, updated = ? WHERE id = ?",
+                             (worker, now + lease, now, row[0]))
+                return QueuedJob(row[0], row[1], row[2], json.loads(row[3]), row[4] + 1, worker)
+        return self._transaction(take)
+
+    def renew(self, jobs, lease=LEASE_SECONDS):
+        if not jobs:
+            return
+        now = time.time()
+        self._transaction(lambda conn: conn.executemany(
+            "UPDATE jobs SET lease_until = ? WHERE id = ? AND state = 'running' AND worker = ?", [(now + lease, job.id, job.worker) for job in jobs]))
+
+    # Each returns the state it wrote, or None when the job's lease was lost and nothing was written
+
+    def complete(self, job):
+        return self._finish(job, 'done')
+
+    def fail(self, job, error, max_attempts=MAX_ATTEMPTS, retry_delay=RETRY_DELAY):
+        # Failed jobs go back in line, after a delay that grows with each attempt, until they have used up their attempts
+        if job.attempts < max_attempts:
+            return self._finish(job, 'queued', error, not_before=time.time() + retry_delay * job.attempts)
+        return self._finish(job, 'failed', error)
+
+    def release(self, job):
+        # A cancelled job goes back in line without counting as an attempt
+        return self._finish(job, 'queued', attempts=job.attempts - 1)
+
+    def _finish(self, job, state, error=None, attempts=None, not_before=None):
+        # Only the claim that still holds the job may settle it; after a lost lease the job belongs to whoever reclaimed it.
+        # A queued job's lease_until is the time before which it is not claimed again.
+        updated = self._transaction(lambda conn: conn.execute(
+            "UPDATE jobs SET state = ?, error = ?, attempts = COALESCE(?, attempts), lease_until = ?, updated = ? "
+            "WHERE id = ? AND state = 'running' AND worker = ?", (state, error, attempts, not_before, time.time(), job.id, job.worker)).rowcount)
+        if not updated:
+            logging.warning(localize('queue_lease_lost', id=job.id, input=job.input_path))
+            return None
+        return state
+
+    def retry_failed(self):
+        return self._transaction(lambda conn: conn.execute(
+            "UPDATE jobs SET state = 'queued', attempts = 0, lease_until = NULL, updated = ? WHERE state = 'failed'", (time.time(),)).rowcount)
+
+    def purge_done(self):
+        return self._transaction(lambda conn: conn.execute("DELETE FROM jobs WHERE state = 'done'").rowcount)
+
+    def counts(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+        counts = dict.fromkeys(STATES, 0)
+        counts.update(rows)
+        return counts
+
+    def jobs(self, state=None):
+        query = "SELECT id, input, output_dir, state, attempts, error, updated FROM jobs"
+        with self._lock:
+            rows = self._conn.execute(query + (" WHERE state = ? ORDER BY id" if state else " ORDER BY id"), (state,) if state else ()).fetchall()
+        return [dict(zip(("id", "input", "output_dir", "state", "attempts", "error", "updated"), row)) for row in rows]
+
+
+def run_queued_job(job, password=None, cancel=None, progress=None):
+    options = job.options
+    os.makedirs(job.output_dir, exist_ok=True)
+    if os.path.isdir(job.input_path):
+        return process_directory(job.input_path, job.output_dir, options["size_threshold"], options["large_volume_size"],
+                                 options["small_volume_size"], options["include_subdirs"], options["small_file_action"], password,
+                                 options["compression_level"], options["max_workers"], options["incremental"], cancel, progress,
+                                 options["auto_level"], options["pack_size"], options["memory_budget"], options["backend"], tuple(options["checksums"]))
+    if not os.path.exists(job.input_path):
+        raise FileNotFoundError(f"Input {job.input_path} does not exist")
+    return copy_file(job.input_path, job.output_dir, options["size_threshold"], options["large_volume_size"], options["small_volume_size"],
+                     options["small_file_action"], password, options["compression_level"], options["incremental"], cancel, progress,
+                     options["auto_level"], options["memory_budget"], options["backend"], tuple(options["checksums"]))
+
+
+def run_queue(queue, max_workers=1, password=None, cancel=None, progress=None, drain=True, lease=LEASE_SECONDS, max_attempts=MAX_ATTEMPTS):
+    # max_workers threads each claim and run one job at a time; with drain they stop once nothing is left to claim
+    running = {}
+    running_lock = threading.Lock()
+    stopped = threading.Event()
+    finished = {'done': 0, 'failed': 0}
+
+    def heartbeat():
+        while not stopped.wait(lease / 3):
+            with running_lock:
+                jobs = list(running.values())
+            try:
+                queue.renew(jobs, lease)
+            except sqlite3.Error as e:
+                logging.error(f"Failed to renew job leases: {e}")
+
+    def retried(call, *args):
+        # A busy or briefly unavailable database must not end the worker: the job it holds would be run again once its
+        # lease expired, and run_queue would return as if the queue had drained
+        while True:
+            try:
+                return call(*args)
+            except sqlite3.Error as e:
+                logging.error(f"Queue database error, retrying: {e}")
+                time.sleep(IDLE_POLL)
+
+    def worker():
+        while not (cancel is not None and cancel.cancelled):
+            job = retried(queue.claim, lease, max_attempts)
+            if job is None:
+                # Jobs still queued are waiting out their retry delay, and draining waits for them too
+                if drain and not retried(queue.counts)['queued']:
+                    return
+                time.sleep(IDLE_POLL)
+                continue
+            with running_lock:
+                running[job.id] = job
+            logging.info(localize('queue_job_started', id=job.id, input=job.input_path, attempt=job.attempts))
+            try:
+                ok = run_queued_job(job, password, cancel, progress)
+                error = None if ok else "compression failed"
+            except Exception as e:
+                ok = False
+                error = str(e)
+            # The job stays in running, and its lease renewed, until its result is written
+            try:
+                if cancel is not None and cancel.cancelled:
+                    retried(queue.release, job)
+                    continue
+                # A job whose lease was lost is counted by the worker that reclaimed it, and a requeued one by its last attempt
+                state = retried(queue.complete, job) if ok else retried(queue.fail, job, error, max_attempts)
+            finally:
+                with running_lock:
+                    running.pop(job.id, None)
+            if state == 'queued':
+                logging.warning(localize('queue_job_retry', id=job.id, input=job.input_path, error=error, attempt=job.attempts, max_attempts=max_attempts))
+            elif state == 'failed':
+                logging.error(localize('queue_job_failed', id=job.id, input=job.input_path, error=error))
+            if state in finished:
+                with running_lock:
+                    finished[state] += 1
+
+    beat = threading.Thread(target=heartbeat, name='meowcat-queue-heartbeat', daemon=True)
+    beat.start()
+    workers = [threading.Thread(target=worker, name=f'meowcat-queue-{n}') for n in range(max(1, max_workers))]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    stopped.set()
+    beat.join()
+    logging.info(localize('queue_finished', done=finished['done'], failed=finished['failed'], queued=queue.counts()['queued']))
+    return finished
@@ -0,0 +1,184 @@
+import os
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from .scanner import input_size
+from .metrics import phase
+
+MANIFEST_NAME = "meowcat_manifest.db"
+SAMPLE_SIZE = 64 * 1024
+# Estimates only look at the most recent runs per level, so they follow hardware and data changes
+HISTORY_RUNS = 50
+
+
+def file_fingerprint(file_path, size=None):
+    # Size plus the first and last 64 KB: cheap enough to run on every input, but only a confirmation on top of size and mtime
+    size = os.path.getsize(file_path) if size is None else size
+    digest = hashlib.blake2b(str(size).encode(), digest_size=16)
+    with open(file_path, 'rb') as f:
+        digest.update(f.read(SAMPLE_SIZE))
+        if size > SAMPLE_SIZE * 2:
+            f.seek(-SAMPLE_SIZE, os.SEEK_END)
+            digest.update(f.read(SAMPLE_SIZE))
+    return digest.hexdigest()
+
+
+def tree_fingerprint(entry):
+    # Built from the scan index, so fingerprinting a directory never reads file contents
+    digest = hashlib.blake2b(digest_size=16)
+    for rel_path, size, mtime in sorted(entry.files):
+        digest.update(f"{rel_path}\0{size}\0{mtime}\n".encode('utf-8', 'surrogateescape'))
+    return digest.hexdigest()
+
+
+def archive_target(file_path, output_dir, split, extension='.7z'):
+    base_name = os.path.basename(file_path)
+    return os.path.join(output_dir, base_name) if split else os.path.join(output_dir, base_name + extension)
+
+
+def entry_fingerprint(entry):
+    return tree_fingerprint(entry) if entry.is_dir else file_fingerprint(entry.path, entry.size)
+
+
+class InputManifest:
+    def __init__(self, output_dir):
+        os.makedirs(output_dir, exist_ok=True)
+        self.path = os.path.join(output_dir, MANIFEST_NAME)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS inputs ("
+            "path TEXT PRIMARY KEY, size INTEGER, mtime REAL, fingerprint TEXT, archive TEXT, updated REAL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS runs ("
+            "level INTEGER, threads INTEGER, input_bytes INTEGER, output_bytes INTEGER, seconds REAL, recorded REAL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS verified ("
+            "path TEXT PRIMARY KEY, size INTEGER, mtime REAL, verified REAL)"
+        )
+        # Inputs a batch has finished, kept until the whole batch succeeds so an interrupted batch resumes where it stopped
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS checkpoints ("
+            "batch TEXT, path TEXT, archive TEXT, updated REAL, PRIMARY KEY (batch, path))"
+        )
+        self._conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def lookup(self, path):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime, fingerprint, archive FROM inputs WHERE path = ?", (os.path.abspath(path),)
+            ).fetchone()
+        return row
+
+    def unchanged(self, path, size, mtime, fingerprint):
+        # Any size or mtime change counts as a change: the sampled fingerprint cannot see an edit in the middle of a file,
+        # so it only confirms a match where size and mtime already agree. fingerprint is a callable so it only runs then.
+        row = self.lookup(path)
+        if row is None:
+            return False
+        old_size, old_mtime, old_fingerprint, archive = row
+        if old_size != size or old_mtime != mtime or not os.path.exists(archive):
+            return False
+        try:
+            return fingerprint() == old_fingerprint
+        except OSError as e:
+            logging.error(f"Failed to fingerprint {path}: {e}")
+            return False
+
+    def record(self, path, size, mtime, fingerprint, archive):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO inputs (path, size, mtime, fingerprint, archive, updated) VALUES (?, ?, ?, ?, ?, ?)",
+                (os.path.abspath(path), size, mtime, fingerprint, os.path.abspath(archive), time.time())
+            )
+            self._conn.commit()
+
+    def record_run(self, level, threads, input_bytes, output_bytes, seconds):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO runs (level, threads, input_bytes, output_bytes, seconds, recorded) VALUES (?, ?, ?, ?, ?, ?)",
+                (level, threads, input_bytes, output_bytes, seconds, time.time())
+            )
+            self._conn.commit()
+
+    def history(self, level, runs=HISTORY_RUNS):
+        # (input bytes per thread-second, output/input ratio) over the latest runs at this level, or None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT SUM(input_bytes), SUM(output_bytes), SUM(seconds * threads) FROM "
+                "(SELECT * FROM runs WHERE level = ? AND seconds > 0 ORDER BY recorded DESC LIMIT ?)", (level, runs)
+            ).fetchone()
+        input_bytes, output_bytes, thread_seconds = row
+        if not input_bytes or not thread_seconds:
+            return None
+        return input_bytes / thread_seconds, output_bytes / input_bytes
+
+    def is_verified(self, path, size, mtime):
+        # True when the archive passed verification and has not been touched since
+        with self._lock:
+            row = self._conn.execute("SELECT size, mtime FROM verified WHERE path = ?", (os.path.abspath(path),)).fetchone()
+        return row is not None and row[0] == size and row[1] == mtime
+
+    def record_verified(self, path, size, mtime):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO verified (path, size, mtime, verified) VALUES (?, ?, ?, ?)",
+                (os.path.abspath(path), size, mtime, time.time())
+            )
+            self._conn.commit()
+
+    def forget_verified(self, path):
+        with self._lock:
+            self._conn.execute("DELETE FROM verified WHERE path = ?", (os.path.abspath(path),))
+            self._conn.commit()
+
+    def checkpointed(self, batch, path):
+        with self._lock:
+            row = self._conn.execute("SELECT archive FROM checkpoints WHERE batch = ? AND path = ?", (batch, os.path.abspath(path))).fetchone()
+        return row[0] if row is not None else None
+
+    def checkpoint(self, batch, path, archive):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checkpoints (batch, path, archive, updated) VALUES (?, ?, ?, ?)",
+                (batch, os.path.abspath(path), os.path.abspath(archive), time.time())
+            )
+            self._conn.commit()
+
+    def clear_checkpoints(self, batch):
+        with self._lock:
+            self._conn.execute("DELETE FROM checkpoints WHERE batch = ?", (batch,))
+            self._conn.commit()
+
+    def tracked(self, entry, archive, func, level=None, threads=None, batch=None):
+        # Wraps a compression job so a successful run is written to the manifest, with its speed when the level is known
+        def run(*args, **kwargs):
+            start = time.perf_counter()
+            ok = func(*args, **kwargs)
+            if ok:
+                try:
+                    with phase('manifest'):
+                        self.record(entry.path, entry.size, entry.mtime, entry_fingerprint(entry), archive)
+                        if batch is not None:
+                            self.checkpoint(batch, entry.path, archive)
+                    if level is not None:
+                        self.record_run(level, threads or 1, entry.size, input_size(archive), time.perf_counter() - start)
+                except OSError as e:
+                    logging.error(f"Failed to record {entry.path} in manifest: {e}")
+            return ok
+        run.__name__ = getattr(func, '__name__', 'job')
+        return run
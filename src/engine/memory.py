@@ -0,0 +1,173 @@
+import os
+import sys
+import logging
+from .pool import cpu_budget, threads_per_job
+from .i18n import localize
+from .trace import span
+
+MB = 1024 * 1024
+# Largest dictionary the engine asks 7z for; this used to be passed to every call as -md=192m
+DEFAULT_DICTIONARY = 192 * MB
+MIN_DICTIONARY = 1 * MB
+# Without an explicit budget the planner may use this share of physical memory
+BUDGET_FRACTION = 0.5
+FALLBACK_BUDGET = 2048 * MB
+PROCESS_OVERHEAD = 16 * MB
+# LZMA encoder cost per dictionary byte: bt4 match finder from -mx5 up, hc4 below
+BT4_FACTOR = 11.5
+HC4_FACTOR = 7.5
+BT4_LEVEL = 5
+ENCODER_OVERHEAD = 6 * MB
+MAX_BLOCK = 256 * MB
+
+
+class JobPlan:
+    def __init__(self, name, size, level, dictionary, threads, memory):
+        self.name = name
+        self.size = size
+        self.level = level
+        self.dictionary = dictionary
+        self.threads = threads
+        self.memory = memory
+
+    def as_dict(self):
+        return dict(self.__dict__)
+
+    def __repr__(self):
+        return f"JobPlan({self.name!r}, md={self.dictionary // MB}m, mmt={self.threads}, memory={self.memory // MB} MB)"
+
+
+class MemoryPlan:
+    def __init__(self, budget, workers, jobs, fits=True):
+        self.budget = budget
+        self.workers = workers
+        self.jobs = jobs  # JobPlan per input, in the order the inputs were given
+        self.fits = fits
+
+    @property
+    def peak(self):
+        # Worst case: the most memory-hungry jobs all run at the same time
+        return sum(sorted((job.memory for job in self.jobs), reverse=True)[:self.workers])
+
+    def as_dict(self):
+        return {"budget": self.budget, "workers": self.workers, "peak": self.peak, "fits": self.fits,
+                "jobs": [job.as_dict() for job in self.jobs]}
+
+
+def physical_memory():
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (AttributeError, ValueError, OSError):
+        pass
+    if sys.platform == 'win32':
+        import ctypes
+
+        class MemoryStatus(ctypes.Structure):
+            _fields_ = [('length', ctypes.c_ulong), ('load', ctypes.c_ulong), ('total_phys', ctypes.c_ulonglong),
+                        ('avail_phys', ctypes.c_ulonglong), ('total_page', ctypes.c_ulonglong), ('avail_page', ctypes.c_ulonglong),
+                        ('total_virtual', ctypes.c_ulonglong), ('avail_virtual', ctypes.c_ulonglong), ('avail_extended', ctypes.c_ulonglong)]
+
+        status = MemoryStatus()
+        status.length = ctypes.sizeof(MemoryStatus)
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            return status.total_phys
+    return None
+
+
+def default_budget():
+    memory = physical_memory()
+    return int(memory * BUDGET_FRACTION) if memory else FALLBACK_BUDGET
+
+
+def dictionary_for(size, cap=DEFAULT_DICTIONARY):
+    # Smallest power of two that covers the input: a bigger window cannot find more matches
+    dictionary = MIN_DICTIONARY
+    while dictionary < size and dictionary < cap:
+        dictionary *= 2
+    return min(dictionary, cap)
+
+
+def block_size(dictionary):
+    # LZMA2 hands each encoder blocks of 4x the dictionary
+    return min(max(4 * dictionary, MIN_DICTIONARY), MAX_BLOCK)
+
+
+def encoder_count(threads, level):
+    # bt4 encoders run two threads each (match finder + coder), hc4 encoders one
+    return max(1, (threads + 1) // 2) if level >= BT4_LEVEL else max(1, threads)
+
+
+def useful_threads(size, dictionary, level):
+    # More encoders than LZMA2 blocks in the input only cost memory
+    blocks = max(1, -(-size // block_size(dictionary)))
+    return blocks * 2 if level >= BT4_LEVEL else blocks
+
+
+def job_memory(dictionary, threads, level):
+    if level == 0:
+        return PROCESS_OVERHEAD
+    factor = BT4_FACTOR if level >= BT4_LEVEL else HC4_FACTOR
+    encoders = encoder_count(threads, level)
+    memory = encoders * int(dictionary * factor + ENCODER_OVERHEAD)
+    if encoders > 1:
+        memory += encoders * block_size(dictionary)
+    return PROCESS_OVERHEAD + memory
+
+
+def plan_job(name, size, level, slot, threads, cap=DEFAULT_DICTIONARY):
+    # Fit one job into its share of the budget, giving up dictionary before threads since threads are throughput
+    dictionary = dictionary_for(size, cap)
+    threads = max(1, min(threads, useful_threads(size, dictionary, level)))
+    while job_memory(dictionary, threads, level) > slot:
+        if dictionary > MIN_DICTIONARY:
+            dictionary = max(MIN_DICTIONARY, dictionary // 2 // MB * MB)
+        elif threads > 1:
+            threads -= 1
+        else:
+            return None
+    return JobPlan(name, size, level, dictionary, threads, job_memory(dictionary, threads, level))
+
+
+def relax_plan(planned, jobs, budget, workers, threads, cap):
+    # Jobs that fit untouched leave part of their even share unused; hand it to the jobs that had to shrink.
+    # Any `workers` jobs running together hold at most k shrunk jobs plus the largest untouched ones, so the peak stays in budget
+    shrunk = [i for i, job in enumerate(planned) if job.dictionary < dictionary_for(job.size, cap)]
+    if not shrunk:
+        return planned
+    k = min(workers, len(shrunk))
+    untouched = sorted((job.memory for i, job in enumerate(planned) if i not in shrunk), reverse=True)
+    slot = (budget - sum(untouched[:workers - k])) // k
+    for i in shrunk:
+        name, size, level = jobs[i]
+        planned[i] = plan_job(name, size, level, slot, threads, cap) or planned[i]
+    return planned
+
+
+def plan_memory(jobs, budget=None, max_workers=1, cpu_count=None, cap=DEFAULT_DICTIONARY):
+    # jobs: (name, size, level); max_workers <= 0 lets the planner go up to one job per core
+    with span('plan_memory', jobs=len(jobs)):
+        return _plan_memory(jobs, budget, max_workers, cpu_count, cap)
+
+
+def _plan_memory(jobs, budget, max_workers, cpu_count, cap):
+    budget = budget or default_budget()
+    cpu_count = cpu_count or cpu_budget()
+    upper = max_workers if max_workers > 0 else cpu_count
+    upper = max(1, min(upper, len(jobs), cpu_count))
+    for workers in range(upper, 0, -1):
+        slot = budget // workers
+        threads = threads_per_job(workers, cpu_count)
+        planned = [plan_job(name, size, level, slot, threads, cap) for name, size, level in jobs]
+        if all(planned):
+            return MemoryPlan(budget, workers, relax_plan(planned, jobs, budget, workers, threads, cap))
+    # Not even one job fits: run them one at a time with the smallest settings
+    planned = [JobPlan(name, size, level, MIN_DICTIONARY, 1, job_memory(MIN_DICTIONARY, 1, level)) for name, size, level in jobs]
+    return MemoryPlan(budget, 1, planned, fits=False)
+
+
+def log_plan(plan):
+    logging.info(localize('memory_plan', jobs=len(plan.jobs), workers=plan.workers, peak=plan.peak // MB, budget=plan.budget // MB))
+    for job in plan.jobs:
+        logging.info(localize('memory_plan_job', name=job.name, dictionary=job.dictionary // MB, threads=job.threads, memory=job.memory // MB))
+    if not plan.fits:
+        logging.warning(localize('memory_over_budget', peak=plan.peak // MB, budget=plan.budget // MB))
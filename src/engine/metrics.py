@@ -0,0 +1,233 @@
+import os
+import sys
+import json
+import time
+import socket
+import logging
+import threading
+from contextlib import contextmanager
+from .trace import span, profiled
+
+PHASES = ('scan', 'compress', 'hash', 'manifest')
+
+_local = threading.local()
+_sink = None
+
+
+class JobMetrics:
+    # One record per archive job; the engine fills it in as the job runs and the sink writes it out at the end
+    def __init__(self, name, input_path, input_bytes, backend=None, level=None, threads=None, dictionary=None):
+        self.name = name
+        self.input_path = input_path
+        self.input_bytes = input_bytes
+        self.backend = backend
+        self.level = level
+        self.threads = threads
+        self.dictionary = dictionary
+        self.archive = None
+        self.output_bytes = None
+        self.volumes = None
+        self.ok = None
+        self.started = time.time()
+        self.wall_seconds = 0.0
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.child_user_seconds = 0.0
+        self.child_system_seconds = 0.0
+        self.child_max_rss = None
+
+    @property
+    def ratio(self):
+        return self.output_bytes / self.input_bytes if self.output_bytes is not None and self.input_bytes else None
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def add_child(self, usage):
+        self.child_user_seconds += usage.ru_utime
+        self.child_system_seconds += usage.ru_stime
+        # ru_maxrss is in KB on Linux and bytes on macOS
+        rss = usage.ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+        self.child_max_rss = max(self.child_max_rss or 0, rss)
+
+    def as_dict(self):
+        data = dict(self.__dict__)
+        data['ratio'] = self.ratio
+        data['host'] = socket.gethostname()
+        return data
+
+
+class MetricsSink:
+    # Appends every job to a JSONL file and keeps a Prometheus textfile-collector file with running totals
+    def __init__(self, jsonl_path=None, textfile_path=None):
+        self.jsonl_path = jsonl_path
+        self.textfile_path = textfile_path
+        self._lock = threading.Lock()
+        self.jobs = {'ok': 0, 'failed': 0}
+        self.input_bytes = 0
+        self.output_bytes = 0
+        self.volumes = 0
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.wall_seconds = 0.0
+        self.child_cpu = {'user': 0.0, 'system': 0.0}
+        self.child_max_rss = 0
+        self.last_job = 0.0
+        self.last_throughput = 0.0
+        # Extra series published by long-running front ends such as the watch daemon: name -> (kind, help, value)
+        self.gauges = {}
+
+    def emit(self, job):
+        with self._lock:
+            self.jobs['ok' if job.ok else 'failed'] += 1
+            if job.ok:
+                self.input_bytes += job.input_bytes or 0
+                self.output_bytes += job.output_bytes or 0
+                self.volumes += job.volumes or 0
+                self.last_throughput = (job.input_bytes or 0) / job.wall_seconds if job.wall_seconds > 0 else 0.0
+            for name, seconds in job.phases.items():
+                self.phases[name] = self.phases.get(name, 0.0) + seconds
+            self.wall_seconds += job.wall_seconds
+            self.child_cpu['user'] += job.child_user_seconds
+            self.child_cpu['system'] += job.child_system_seconds
+            self.child_max_rss = max(self.child_max_rss, job.child_max_rss or 0)
+            self.last_job = time.time()
+            try:
+                if self.jsonl_path:
+                    with open(self.jsonl_path, 'a', encoding='utf-8') as f:
+                        f.write(json.dumps(job.as_dict(), ensure_ascii=False) + '\n')
+                if self.textfile_path:
+                    self.write_textfile()
+            except OSError as e:
+                logging.error(f"Failed to write metrics: {e}")
+
+    def publish(self, values):
+        with self._lock:
+            self.gauges.update(values)
+            try:
+                if self.textfile_path:
+                    self.write_textfile()
+            except OSError as e:
+                logging.error(f"Failed to write metrics: {e}")
+
+    def write_textfile(self):
+        lines = [
+            "# HELP meowcat_jobs_total Archive jobs finished, by status.",
+            "# TYPE meowcat_jobs_total counter"
+        ]
+        lines += [f'meowcat_jobs_total{{status="{status}"}} {count}' for status, count in self.jobs.items()]
+        lines += [
+            "# HELP meowcat_input_bytes_total Input bytes of successful jobs.",
+            "# TYPE meowcat_input_bytes_total counter",
+            f"meowcat_input_bytes_total {self.input_bytes}",
+            "# HELP meowcat_output_bytes_total Archive bytes written by successful jobs.",
+            "# TYPE meowcat_output_bytes_total counter",
+            f"meowcat_output_bytes_total {self.output_bytes}",
+            "# HELP meowcat_volumes_total Archive volumes written by successful jobs.",
+            "# TYPE meowcat_volumes_total counter",
+            f"meowcat_volumes_total {self.volumes}",
+            "# HELP meowcat_job_seconds_total Wall time spent in jobs.",
+            "# TYPE meowcat_job_seconds_total counter",
+            f"meowcat_job_seconds_total {self.wall_seconds:.6f}",
+            "# HELP meowcat_phase_seconds_total Wall time per job phase.",
+            "# TYPE meowcat_phase_seconds_total counter"
+        ]
+        lines += [f'meowcat_phase_seconds_total{{phase="{name}"}} {seconds:.6f}' for name, seconds in self.phases.items()]
+        lines += [
+            "# HELP meowcat_child_cpu_seconds_total CPU time of 7z child processes.",
+            "# TYPE meowcat_child_cpu_seconds_total counter"
+        ]
+        lines += [f'meowcat_child_cpu_seconds_total{{mode="{mode}"}} {seconds:.6f}' for mode, seconds in self.child_cpu.items()]
+        lines += [
+            "# HELP meowcat_child_max_rss_bytes Largest peak RSS of any 7z child process.",
+            "# TYPE meowcat_child_max_rss_bytes gauge",
+            f"meowcat_child_max_rss_bytes {self.child_max_rss}",
+            "# HELP meowcat_last_job_throughput_bytes_per_second Input bytes per second of the latest successful job.",
+            "# TYPE meowcat_last_job_throughput_bytes_per_second gauge",
+            f"meowcat_last_job_throughput_bytes_per_second {self.last_throughput:.3f}",
+            "# HELP meowcat_last_job_timestamp_seconds When the latest job finished.",
+            "# TYPE meowcat_last_job_timestamp_seconds gauge",
+            f"meowcat_last_job_timestamp_seconds {self.last_job:.3f}"
+        ]
+        for name, (kind, help_text, value) in sorted(self.gauges.items()):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {value}"]
+        # The collector may read at any moment, so the file is swapped in whole
+        tmp_path = self.textfile_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp_path, self.textfile_path)
+
+
+def configure(jsonl_path=None, textfile_path=None):
+    global _sink
+    _sink = MetricsSink(jsonl_path, textfile_path) if jsonl_path or textfile_path else None
+    return _sink
+
+
+def publish(values):
+    # values: {name: (kind, help, value)}; a no-op unless a sink is configured
+    if _sink is not None:
+        _sink.publish(values)
+
+
+def current():
+    # The JobMetrics of the job running on this thread, or None outside a metered job
+    return getattr(_local, 'job', None)
+
+
+@contextmanager
+def phase(name):
+    job = current()
+    if job is None:
+        with span(name):
+            yield
+        return
+    with job.phase(name), span(name, job=job.name):
+        yield
+
+
+def note(**values):
+    job = current()
+    if job is not None:
+        for key, value in values.items():
+            setattr(job, key, value)
+
+
+def metered(job, func):
+    # Wraps a job so everything it does on its thread is recorded into `job`, which is emitted when it returns
+    def run(*args, **kwargs):
+        _local.job = job
+        start = time.perf_counter()
+        try:
+            with span('job', 'job', job=job.name, input_bytes=job.input_bytes):
+                job.ok = bool(profiled(func)(*args, **kwargs))
+            return job.ok
+        except Exception:
+            job.ok = False
+            raise
+        finally:
+            job.wall_seconds = time.perf_counter() - start
+            _local.job = None
+            if _sink is not None:
+                _sink.emit(job)
+    run.__name__ = getattr(func, '__name__', 'job')
+    return run
+
+
+def wait_child(process):
+    # Reaps the child with wait4 where the OS has it, so its CPU time and peak RSS land in the current job
+    if hasattr(os, 'wait4'):
+        try:
+            pid, status, usage = os.wait4(process.pid, 0)
+        except ChildProcessError:
+            # Already reaped, by a cancel on another thread
+            return process.wait()
+        process.returncode = os.waitstatus_to_exitcode(status)
+        job = current()
+        if job is not None:
+            job.add_child(usage)
+        return process.returncode
+    return process.wait()
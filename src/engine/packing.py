@@ -0,0 +1,101 @@
+import os
+import json
+import logging
+import threading
+from .process import discard_output
+from .i18n import localize
+
+PACK_INDEX_SUFFIX = "_packs.json"
+
+
+def plan_packs(items, target_size):
+    # First-fit decreasing: items are (size, payload); returns bins as lists of items, each bin summing to <= target_size
+    bins = []
+    for item in sorted(items, key=lambda item: item[0], reverse=True):
+        for pack in bins:
+            if pack[0] + item[0] <= target_size:
+                pack[0] += item[0]
+                pack[1].append(item)
+                break
+        else:
+            bins.append([item[0], [item]])
+    return [pack[1] for pack in bins]
+
+
+class PackIndex:
+    # Maps every packed input to the combined archive it ended up in: <output_dir>/<input name>_packs.json
+    def __init__(self, output_dir, name):
+        self.output_dir = output_dir
+        self.path = os.path.join(output_dir, name + PACK_INDEX_SUFFIX)
+        self.name = name
+        self._lock = threading.Lock()
+        self.packs = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.packs = {pack['archive']: pack for pack in json.load(f).get('packs', [])}
+            except (OSError, ValueError) as e:
+                logging.error(f"Failed to read pack index {self.path}: {e}")
+
+    def next_archive_names(self, count, extension='.7z'):
+        used = {pack['number'] for pack in self.packs.values()}
+        number = max(used, default=0)
+        names = []
+        for _ in range(count):
+            number += 1
+            names.append((number, f"{self.name}_pack_{number:04d}{extension}"))
+        return names
+
+    def add(self, number, archive, members):
+        # A member lives in exactly one pack: the latest one it was written to
+        with self._lock:
+            self._release({member['path'] for member in members})
+            self.packs[archive] = {"number": number, "archive": archive, "members": members}
+            self.save()
+
+    def discard(self, paths):
+        # For inputs that were archived on their own instead of into a pack
+        with self._lock:
+            self._release({os.path.abspath(path) for path in paths})
+            self.save()
+
+    def prune(self, live_paths):
+        # Drops members whose input is gone and returns the packs that lost one: they still hold its old data, so their
+        # remaining members have to be packed again before the pack can be deleted
+        live = {os.path.abspath(path) for path in live_paths}
+        with self._lock:
+            touched = {pack['archive'] for pack in self.packs.values() if any(member['path'] not in live for member in pack['members'])}
+            gone = {member['path'] for pack in self.packs.values() for member in pack['members'] if member['path'] not in live}
+            if gone:
+                self._release(gone)
+                self.save()
+        return touched
+
+    def locations(self):
+        # {input path: pack archive} over every current member
+        with self._lock:
+            return {member['path']: pack['archive'] for pack in self.packs.values() for member in pack['members']}
+
+    def _release(self, paths):
+        # Takes the members out of their packs; a pack left without members only holds stale data and is deleted
+        for archive, pack in list(self.packs.items()):
+            pack['members'] = [member for member in pack['members'] if member['path'] not in paths]
+            if not pack['members']:
+                discard_output(os.path.join(self.output_dir, archive))
+                del self.packs[archive]
+                logging.info(localize('pack_retired', archive=os.path.join(self.output_dir, archive)))
+
+    def find(self, path):
+        path = os.path.abspath(path)
+        for pack in self.packs.values():
+            for member in pack['members']:
+                if member['path'] == path:
+                    return pack['archive']
+        return None
+
+    def save(self):
+        data = {"packs": sorted(self.packs.values(), key=lambda pack: pack['number'])}
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=4, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,34 @@
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+
+def cpu_budget():
+    return os.cpu_count() or 1
+
+
+def threads_per_job(max_workers, cpu_count=None):
+    # Split the cores between the concurrent 7z processes so workers * -mmt never oversubscribes the machine
+    cpu_count = cpu_count or cpu_budget()
+    return max(1, cpu_count // max(1, max_workers))
+
+
+def run_jobs(jobs, max_workers=1, cancel=None):
+    # jobs: iterable of (size, func, args); the largest jobs start first so the batch does not end on a long straggler
+    ordered = sorted(jobs, key=lambda job: job[0], reverse=True)
+    if max_workers <= 1:
+        return [_run_job(func, args, cancel) for size, func, args in ordered]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_run_job, func, args, cancel) for size, func, args in ordered]
+        return [future.result() for future in futures]
+
+
+def _run_job(func, args, cancel):
+    if cancel is not None and cancel.cancelled:
+        return False
+    try:
+        return func(*args)
+    except Exception as e:
+        logging.error(f"Job {getattr(func, '__name__', func)}{args[:1]} failed: {e}")
+        return False
@@ -0,0 +1,173 @@
+import os
+import sys
+import shutil
+import logging
+import threading
+import subprocess
+from .progress import stream_command
+from .metrics import wait_child
+from .trace import span
+from .i18n import localize
+
+TERMINATE_TIMEOUT = 5
+# Outputs are written under this prefix next to their final name and renamed into place once complete
+STAGING_PREFIX = ".meowcat-partial-"
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class CancelToken:
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._processes = set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self):
+        self._event.set()
+        with self._lock:
+            processes = list(self._processes)
+        for process in processes:
+            terminate_process(process)
+
+    def check(self):
+        if self.cancelled:
+            raise JobCancelled()
+
+    def register(self, process):
+        with self._lock:
+            self._processes.add(process)
+        # cancel() may have run between Popen and register
+        if self.cancelled:
+            terminate_process(process)
+
+    def unregister(self, process):
+        with self._lock:
+            self._processes.discard(process)
+
+
+def terminate_process(process):
+    if process.poll() is not None:
+        return
+    process.terminate()
+    try:
+        process.wait(TERMINATE_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def run_command(command, cancel=None, progress=None, file_path=None, total_bytes=None, archive_name=None):
+    with span('7z', 'subprocess', command=[arg if not arg.startswith('-p') else '-p***' for arg in command]):
+        _run_command(command, cancel, progress, file_path, total_bytes, archive_name)
+
+
+def _run_command(command, cancel, progress, file_path, total_bytes, archive_name):
+    if progress is not None:
+        for event in stream_command(command, file_path, total_bytes, archive_name, cancel):
+            progress(event)
+        return
+
+    if cancel is not None:
+        cancel.check()
+    # Nothing ever answers 7z on stdin: a password prompt fails at once instead of blocking the worker forever
+    process = subprocess.Popen(command, stdin=subprocess.DEVNULL)
+    if cancel is not None:
+        cancel.register(process)
+    try:
+        returncode = wait_child(process)
+    finally:
+        if cancel is not None:
+            cancel.unregister(process)
+    if cancel is not None and cancel.cancelled:
+        raise JobCancelled(command)
+    if returncode:
+        raise subprocess.CalledProcessError(returncode, command)
+
+
+def staging_prefix():
+    # The owning process is part of the name, so a sweep can tell a killed run's leftovers from a live run's outputs
+    return f"{STAGING_PREFIX}{os.getpid()}-"
+
+
+def staging_path(target):
+    return os.path.join(os.path.dirname(target), staging_prefix() + os.path.basename(target))
+
+
+def is_staging(name):
+    return os.path.basename(name).startswith(STAGING_PREFIX)
+
+
+def staging_owner(name):
+    pid, sep, _ = os.path.basename(name)[len(STAGING_PREFIX):].partition('-')
+    return int(pid) if sep and pid.isdigit() else None
+
+
+def process_running(pid):
+    if pid == os.getpid():
+        return True
+    if sys.platform == 'win32':
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        # PROCESS_QUERY_LIMITED_INFORMATION; a process that has not exited reports the exit code STILL_ACTIVE (259)
+        handle = kernel32.OpenProcess(0x1000, False, pid)
+        if not handle:
+            return False
+        try:
+            code = ctypes.c_ulong()
+            return bool(kernel32.GetExitCodeProcess(handle, ctypes.byref(code))) and code.value == 259
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def sweep_staging(output_dir):
+    # Staging outputs of runs that were killed before they could publish or discard them. Those of processes still
+    # running are left alone, since another run may be writing into the same output directory; names without an owner
+    # predate owner tagging and cannot belong to a live run.
+    try:
+        names = os.listdir(output_dir)
+    except OSError:
+        return
+    for name in names:
+        if not is_staging(name):
+            continue
+        pid = staging_owner(name)
+        if pid is not None and process_running(pid):
+            continue
+        logging.info(localize('staging_swept', path=os.path.join(output_dir, name)))
+        discard_output(os.path.join(output_dir, name))
+
+
+def discard_output(path):
+    try:
+        if os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path)
+        elif os.path.lexists(path):
+            os.remove(path)
+    except OSError as e:
+        logging.error(f"Failed to remove partial output {path}: {e}")
+
+
+def publish_output(staging, target):
+    # A file replaces its old version in one rename. A directory cannot be renamed over a non-empty one, so the old
+    # volume set is moved aside first and only deleted once the new one is in place.
+    if os.path.lexists(target) and (os.path.isdir(staging) or os.path.isdir(target)):
+        retired = staging_path(target) + ".old"
+        discard_output(retired)
+        os.replace(target, retired)
+        os.replace(staging, target)
+        discard_output(retired)
+    else:
+        os.replace(staging, target)
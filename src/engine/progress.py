@@ -0,0 +1,134 @@
+import os
+import re
+import time
+import subprocess
+from .metrics import wait_child
+
+# 7z -bsp1 redraws one status line with backspaces: " 42% 17 + dir/file.bin"
+PROGRESS_PATTERN = re.compile(r'^\s*(\d{1,3})%(?:\s+(\d+))?(?:\s+\S\s+(.*))?$')
+LINE_SPLIT = re.compile(rb'[\r\n\x08]+')
+VOLUME_POLL_INTERVAL = 1.0
+
+
+class ProgressEvent:
+    def __init__(self, file_path, percent, bytes_done=None, total_bytes=None, rate=None, eta=None, volume=None, current=None):
+        self.file_path = file_path
+        self.percent = percent
+        self.bytes_done = bytes_done
+        self.total_bytes = total_bytes
+        self.rate = rate
+        self.eta = eta
+        self.volume = volume
+        self.current = current
+
+    def as_dict(self):
+        return dict(self.__dict__)
+
+    def __repr__(self):
+        return f"ProgressEvent({self.file_path!r}, {self.percent}%, rate={self.rate}, eta={self.eta}, volume={self.volume})"
+
+
+def format_progress(event):
+    parts = [f"{event.percent}%"]
+    if event.rate:
+        parts.append(f"{event.rate / (1024 * 1024):.1f} MB/s")
+    if event.eta is not None:
+        parts.append(f"ETA {int(event.eta) // 60}:{int(event.eta) % 60:02d}")
+    if event.volume:
+        parts.append(f"vol {event.volume}")
+    return " | ".join(parts)
+
+
+def count_volumes(archive_name):
+    directory, prefix = os.path.split(archive_name)
+    try:
+        return sum(1 for f in os.listdir(directory) if f.startswith(prefix + '.') and f[len(prefix) + 1:].isdigit())
+    except OSError:
+        return 0
+
+
+def stream_command(command, file_path=None, total_bytes=None, archive_name=None, cancel=None):
+    # Runs 7z with -bsp1 and yields a ProgressEvent every time the percentage moves
+    if '-bsp1' not in command:
+        command = command[:2] + ['-bsp1'] + command[2:]
+    if cancel is not None:
+        cancel.check()
+    process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE)
+    if cancel is not None:
+        cancel.register(process)
+
+    started = time.monotonic()
+    last_percent = -1
+    volume = None
+    volume_polled = 0.0
+    pending = b''
+    try:
+        while True:
+            chunk = process.stdout.read1(4096) if hasattr(process.stdout, 'read1') else process.stdout.read(4096)
+            if not chunk:
+                break
+            pieces = LINE_SPLIT.split(pending + chunk)
+            pending = pieces.pop()
+            for piece in pieces:
+                match = PROGRESS_PATTERN.match(piece.decode('utf-8', 'replace'))
+                # 100% is reported once, after 7z exits and the final volume count is known
+                if not match or int(match.group(1)) in (last_percent, 100):
+                    continue
+                last_percent = int(match.group(1))
+                now = time.monotonic()
+                if archive_name and now - volume_polled >= VOLUME_POLL_INTERVAL:
+                    volume = count_volumes(archive_name) or None
+                    volume_polled = now
+                yield _event(file_path, last_percent, total_bytes, now - started, volume, match.group(3))
+        returncode = wait_child(process)
+    finally:
+        process.stdout.close()
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        if cancel is not None:
+            cancel.unregister(process)
+
+    if cancel is not None and cancel.cancelled:
+        cancel.check()
+    if returncode:
+        raise subprocess.CalledProcessError(returncode, command)
+    if archive_name:
+        volume = count_volumes(archive_name) or None
+    yield _event(file_path, 100, total_bytes, time.monotonic() - started, volume, None)
+
+
+def _event(file_path, percent, total_bytes, elapsed, volume, current):
+    bytes_done = total_bytes * percent // 100 if total_bytes is not None else None
+    rate = bytes_done / elapsed if bytes_done and elapsed > 0 else None
+    if percent >= 100:
+        eta = 0.0
+    elif percent > 0:
+        eta = elapsed * (100 - percent) / percent
+    else:
+        eta = None
+    return ProgressEvent(file_path, percent, bytes_done, total_bytes, rate, eta, volume, current)
+
+
+class ByteProgress:
+    # Same events as stream_command, driven by byte counts from the in-process backends instead of 7z output
+    def __init__(self, file_path, total_bytes, progress):
+        self.file_path = file_path
+        self.total_bytes = total_bytes
+        self.progress = progress
+        self.bytes_done = 0
+        self.last_percent = -1
+        self.started = time.monotonic()
+
+    def advance(self, count, volume=None, current=None):
+        self.bytes_done += count
+        if self.progress is None or not self.total_bytes:
+            return
+        percent = min(99, self.bytes_done * 100 // self.total_bytes)
+        if percent != self.last_percent:
+            self.last_percent = percent
+            self.progress(_event(self.file_path, percent, self.total_bytes, time.monotonic() - self.started, volume, current))
+
+    def finish(self, volume=None):
+        if self.progress is not None:
+            self.progress(_event(self.file_path, 100, self.total_bytes, time.monotonic() - self.started, volume, None))
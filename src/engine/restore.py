@@ -0,0 +1,388 @@
+import io
+import os
+import json
+import lzma
+import time
+import struct
+import bisect
+import logging
+import tarfile
+import zipfile
+import tempfile
+import threading
+import subprocess
+from .pool import run_jobs, cpu_budget, threads_per_job
+from .process import run_command, JobCancelled, is_staging, discard_output, publish_output, staging_prefix, staging_path
+from .trace import span
+from .i18n import localize
+
+COPY_CHUNK = 1024 * 1024
+INFO_NAME = "info.json"
+# Longest suffix first, so a .tar.xz is not taken for something else
+ARCHIVE_EXTENSIONS = (('.tar.xz', 'xz'), ('.zip', 'zip'), ('.7z', '7z'))
+
+
+class RestoreError(Exception):
+    pass
+
+
+def read_info(archive_path):
+    with open(os.path.join(archive_path, INFO_NAME), 'r') as info_file:
+        return json.load(info_file)
+
+
+def archive_backend(name):
+    for extension, backend in ARCHIVE_EXTENSIONS:
+        if name.endswith(extension):
+            return backend
+    return None
+
+
+def discover_archives(output_dir):
+    # Volume sets are directories holding an info.json; everything else that looks like an archive stands alone
+    archives = []
+    for root, dirs, files in os.walk(output_dir):
+        # Staging outputs of a run in progress, or of one that was killed, are not archives yet
+        dirs[:] = sorted(name for name in dirs if not is_staging(name))
+        files = [name for name in files if not is_staging(name)]
+        if INFO_NAME in files:
+            archives.append(root)
+            # The parts belong to the set and are not archives of their own
+            dirs[:] = []
+            continue
+        for name in sorted(files):
+            if archive_backend(name) is not None:
+                archives.append(os.path.join(root, name))
+    return archives
+
+
+def archive_signature(path):
+    # (total size, latest mtime) over the archive, or over info.json and every file of a volume set
+    if not os.path.isdir(path):
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime
+    size = 0
+    mtime = 0.0
+    with os.scandir(path) as it:
+        for entry in it:
+            if entry.is_file():
+                stat = entry.stat()
+                size += stat.st_size
+                mtime = max(mtime, stat.st_mtime)
+    return size, mtime
+
+
+class VolumeReader(io.RawIOBase):
+    # The parts of a split archive read as one seekable stream; a part is only opened once bytes from it are needed
+    def __init__(self, archive_path, parts):
+        self.paths = [os.path.join(archive_path, part["part_name"]) for part in parts]
+        self.starts = []
+        self.size = 0
+        for part in parts:
+            self.starts.append(self.size)
+            self.size += part["part_size"]
+        self.position = 0
+        self.opened = set()
+        self._file = None
+        self._index = None
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        self.position = max(0, offset)
+        return self.position
+
+    def readinto(self, buffer):
+        if self.position >= self.size:
+            return 0
+        index = bisect.bisect_right(self.starts, self.position) - 1
+        if index != self._index:
+            if self._file is not None:
+                self._file.close()
+            self._file = open(self.paths[index], 'rb')
+            self._index = index
+            self.opened.add(index + 1)
+        end = self.starts[index + 1] if index + 1 < len(self.starts) else self.size
+        self._file.seek(self.position - self.starts[index])
+        count = self._file.readinto(memoryview(buffer)[:min(len(buffer), end - self.position)])
+        if not count:
+            raise RestoreError(f"{self.paths[index]} is shorter than info.json says")
+        self.position += count
+        return count
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        super().close()
+
+
+class _XzRange:
+    # Decoded bytes of the xz stream at [offset, offset + length) of the reader, starting `skip` bytes into it
+    def __init__(self, reader, offset, length, skip, cancel=None):
+        self.reader = reader
+        self.left = length
+        self.skip = skip
+        self.cancel = cancel
+        self.buffer = bytearray()
+        self.decompressor = lzma.LZMADecompressor(format=lzma.FORMAT_XZ)
+        reader.seek(offset)
+
+    def read(self, size=-1):
+        while (size < 0 or len(self.buffer) < size) and not self.decompressor.eof:
+            if self.cancel is not None:
+                self.cancel.check()
+            chunk = b''
+            if self.decompressor.needs_input:
+                chunk = self.reader.read(min(COPY_CHUNK, self.left))
+                if not chunk:
+                    break
+                self.left -= len(chunk)
+            data = self.decompressor.decompress(chunk, COPY_CHUNK)
+            if self.skip:
+                dropped = min(self.skip, len(data))
+                data = data[dropped:]
+                self.skip -= dropped
+            self.buffer += data
+        if size < 0:
+            size = len(self.buffer)
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+
+def find_entry(entries, member):
+    name = member.replace(os.sep, '/')
+    while name.startswith('./'):
+        name = name[2:]
+    for entry in entries:
+        if entry["name"] == name:
+            return entry
+    return None
+
+
+def member_target(output_dir, name):
+    # Member names come from our own archives, but a restore never writes outside output_dir
+    target = os.path.normpath(os.path.join(output_dir, name))
+    if os.path.commonpath([os.path.abspath(output_dir), os.path.abspath(target)]) != os.path.abspath(output_dir):
+        raise RestoreError(f"Refusing to restore {name} outside {output_dir}")
+    return target
+
+
+def copy_member(source, target, cancel=None):
+    os.makedirs(os.path.dirname(target) or '.', exist_ok=True)
+    with open(target, 'wb') as f:
+        while True:
+            if cancel is not None:
+                cancel.check()
+            chunk = source.read(COPY_CHUNK)
+            if not chunk:
+                break
+            f.write(chunk)
+
+
+def restore_tar_member(reader, entry, target, cancel=None):
+    with tarfile.open(fileobj=_XzRange(reader, entry["offset"], entry["length"], entry["skip"], cancel), mode='r|') as tar:
+        info = tar.next()
+        if info is None or info.name != entry["name"]:
+            raise RestoreError(f"Volume index does not match the archive at {entry['name']}")
+        copy_member(tar.extractfile(info), target, cancel)
+
+
+def restore_zip_member(reader, entry, target, cancel=None):
+    reader.seek(entry["offset"])
+    header = reader.read(zipfile.sizeFileHeader)
+    if len(header) != zipfile.sizeFileHeader:
+        raise RestoreError(f"Truncated zip header for {entry['name']}")
+    fields = struct.unpack(zipfile.structFileHeader, header)
+    if fields[0] != zipfile.stringFileHeader:
+        raise RestoreError(f"Volume index does not match the archive at {entry['name']}")
+    # Skip the name and extra field; the sizes and CRC come from the index, as they would from the central directory
+    reader.seek(entry["offset"] + zipfile.sizeFileHeader + fields[10] + fields[11])
+    info = zipfile.ZipInfo(entry["name"])
+    info.compress_type = entry["compress_type"]
+    info.compress_size = entry["compressed_size"]
+    info.file_size = entry["size"]
+    info.CRC = entry["crc"]
+    with zipfile.ZipExtFile(reader, 'r', info) as source:
+        copy_member(source, target, cancel)
+
+
+def restore_member(archive_path, member, output_dir, password=None, cancel=None):
+    # Extracts one member of a split archive, reading only the parts its index entry names
+    info = read_info(archive_path)
+    parts = info["parts"]
+    entries = info.get("entries") or []
+    backend = info.get("backend", '7z')
+    os.makedirs(output_dir, exist_ok=True)
+    if not entries:
+        if backend != '7z':
+            raise RestoreError(f"{archive_path} has no volume index")
+        # 7z archives carry no index; 7z itself seeks to the folder holding the member. It exits cleanly when nothing
+        # matches, so it extracts into an empty staging directory where the member can be checked for before it is moved.
+        target = member_target(output_dir, member)
+        staging = tempfile.mkdtemp(prefix=staging_prefix(), dir=output_dir)
+        try:
+            command = ['7z', 'x', '-p{}'.format(password or ''), os.path.join(archive_path, parts[0]["part_name"]), '-o{}'.format(staging), '-y', member]
+            run_command(command, cancel)
+            extracted = member_target(staging, member)
+            if not os.path.lexists(extracted):
+                raise RestoreError(localize('member_not_found', member=member, archive_path=archive_path))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            publish_output(extracted, target)
+        finally:
+            discard_output(staging)
+        return target
+
+    entry = find_entry(entries, member)
+    if entry is None:
+        raise RestoreError(localize('member_not_found', member=member, archive_path=archive_path))
+    first, last = entry["parts"]
+    missing = [part["part_name"] for part in parts[first - 1:last] if not os.path.exists(os.path.join(archive_path, part["part_name"]))]
+    if missing:
+        raise RestoreError(f"Parts needed for {entry['name']} are missing: {', '.join(missing)}")
+    target = member_target(output_dir, entry["name"])
+    # Written next to the target and renamed over it once complete, so a failed restore leaves whatever was there before
+    staging = staging_path(target)
+    reader = VolumeReader(archive_path, parts)
+    try:
+        with span('restore', archive=archive_path, member=entry["name"]):
+            if backend == 'xz':
+                restore_tar_member(reader, entry, staging, cancel)
+            else:
+                restore_zip_member(reader, entry, staging, cancel)
+        publish_output(staging, target)
+    except BaseException as e:
+        discard_output(staging)
+        if isinstance(e, (lzma.LZMAError, tarfile.TarError, zipfile.BadZipFile)):
+            raise RestoreError(str(e)) from e
+        raise
+    finally:
+        reader.close()
+    logging.info(localize('member_restored', member=entry["name"], target=target, read=len(reader.opened), part_count=len(parts)))
+    return target
+
+
+class RestoreResult:
+    def __init__(self, path, backend, size, ok, error=None, seconds=0.0):
+        self.path = path
+        self.backend = backend
+        self.size = size
+        self.ok = ok
+        self.error = error
+        self.seconds = seconds
+
+    def as_dict(self):
+        return dict(self.__dict__)
+
+
+def archive_parts(path):
+    # (backend, parts as in info.json) for a volume set, or a single part for a standalone archive
+    if os.path.isdir(path):
+        info = read_info(path)
+        return info.get("backend", '7z'), info["parts"]
+    return archive_backend(path), [{"part_name": os.path.basename(path), "part_size": os.path.getsize(path)}]
+
+
+def extract_archive(path, target_dir, password=None, threads=None, cancel=None):
+    backend, parts = archive_parts(path)
+    archive_dir = path if os.path.isdir(path) else os.path.dirname(path)
+    os.makedirs(target_dir, exist_ok=True)
+    if backend == '7z':
+        # 7z picks up the other volumes next to the first one
+        # -p is always given, empty without a password, so 7z never prompts for one
+        command = ['7z', 'x', '-p{}'.format(password or ''), os.path.join(archive_dir, parts[0]["part_name"]), '-o{}'.format(target_dir), '-y']
+        if threads:
+            command[2:2] = ['-mmt{}'.format(threads)]
+        run_command(command, cancel)
+        return backend
+    reader = VolumeReader(archive_dir, parts)
+    try:
+        if backend == 'xz':
+            with lzma.LZMAFile(reader) as stream, tarfile.open(fileobj=stream, mode='r|') as tar:
+                for info in tar:
+                    if cancel is not None:
+                        cancel.check()
+                    # The data filter refuses absolute paths, links out of target_dir and device files
+                    if hasattr(tarfile, 'data_filter'):
+                        tar.extract(info, target_dir, filter='data')
+                    else:
+                        tar.extract(info, target_dir)
+        else:
+            with zipfile.ZipFile(reader) as archive:
+                for info in archive.infolist():
+                    if cancel is not None:
+                        cancel.check()
+                    archive.extract(info, target_dir)
+    finally:
+        reader.close()
+    return backend
+
+
+def device_limit(path, max_workers):
+    # Concurrent extractions reading one device: one pair for a spinning disk, where parallel reads only add seeks,
+    # max_workers for anything else. Linux tells us through sysfs; elsewhere the device is assumed to be solid state.
+    try:
+        device = os.stat(path).st_dev
+        queue = f"/sys/dev/block/{os.major(device)}:{os.minor(device)}"
+        for candidate in (os.path.join(queue, 'queue', 'rotational'), os.path.join(queue, '..', 'queue', 'rotational')):
+            if os.path.exists(candidate):
+                with open(candidate) as f:
+                    return min(2, max_workers) if f.read().strip() == '1' else max_workers
+    except (OSError, AttributeError, ValueError):
+        pass
+    return max_workers
+
+
+def restore_outputs(output_dir, target_dir, max_workers=None, password=None, io_limit=None, cancel=None):
+    # Extracts every archive and volume set under output_dir into the same relative place under target_dir
+    max_workers = max_workers or cpu_budget()
+    threads = threads_per_job(max_workers)
+    archives = discover_archives(output_dir)
+    limits = {}
+    lock = threading.Lock()
+
+    def limit_for(path):
+        device = os.stat(path).st_dev
+        with lock:
+            if device not in limits:
+                limits[device] = threading.BoundedSemaphore(io_limit or device_limit(path, max_workers))
+            return limits[device]
+
+    def run(path, size):
+        # A volume set given directly restores into target_dir itself
+        relative = '.' if os.path.normpath(path) == os.path.normpath(output_dir) else os.path.relpath(os.path.dirname(path), output_dir)
+        start = time.perf_counter()
+        try:
+            with limit_for(path), span('extract', archive=path):
+                backend = extract_archive(path, os.path.normpath(os.path.join(target_dir, relative)), password, threads, cancel)
+        except JobCancelled:
+            return None
+        except (OSError, ValueError, KeyError, RestoreError, lzma.LZMAError, tarfile.TarError, zipfile.BadZipFile, subprocess.CalledProcessError) as e:
+            logging.error(localize('archive_restore_failed', archive=path, error=e))
+            return RestoreResult(path, None, size, False, str(e), time.perf_counter() - start)
+        return RestoreResult(path, backend, size, True, seconds=time.perf_counter() - start)
+
+    jobs = []
+    for path in archives:
+        size, _ = archive_signature(path)
+        jobs.append((size, run, (path, size)))
+    started = time.perf_counter()
+    results = [result for result in run_jobs(jobs, max_workers, cancel) if isinstance(result, RestoreResult)]
+    seconds = time.perf_counter() - started
+    restored = sum(result.size for result in results if result.ok)
+    logging.info(localize('restore_summary', count=sum(1 for result in results if result.ok), failed=sum(1 for result in results if not result.ok),
+                          size=f"{restored / (1024 * 1024):.1f}", seconds=f"{seconds:.1f}",
+                          throughput=f"{restored / (1024 * 1024) / seconds if seconds > 0 else 0:.1f}"))
+    return results
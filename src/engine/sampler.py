@@ -0,0 +1,70 @@
+import os
+import zlib
+import logging
+from .i18n import localize
+from .trace import span
+
+SAMPLE_BLOCK = 64 * 1024
+BLOCKS_PER_FILE = 3
+MAX_SAMPLED_FILES = 32
+# Sampled zlib ratio above which the input is treated as already compressed
+STORE_RATIO = 0.95
+CHEAP_RATIO = 0.85
+CHEAP_LEVEL = 1
+
+
+def sample_file(file_path, size=None, block_size=SAMPLE_BLOCK, blocks=BLOCKS_PER_FILE):
+    # Trial-compresses blocks from the start, middle and end; returns (raw bytes read, compressed bytes)
+    size = os.path.getsize(file_path) if size is None else size
+    if size <= 0:
+        return 0, 0
+    if size <= block_size * blocks:
+        offsets = [0]
+        block_size = size
+    else:
+        step = (size - block_size) // (blocks - 1)
+        offsets = [i * step for i in range(blocks)]
+    raw = packed = 0
+    with open(file_path, 'rb') as f:
+        for offset in offsets:
+            f.seek(offset)
+            data = f.read(block_size)
+            raw += len(data)
+            packed += len(zlib.compress(data, 1))
+    return raw, packed
+
+
+def sample_ratio(entry, max_files=MAX_SAMPLED_FILES):
+    # Size-weighted ratio over the largest files of the entry, since they decide the archive's cost
+    if entry.is_dir:
+        files = sorted(entry.files, key=lambda item: item[1], reverse=True)[:max_files]
+        candidates = [(os.path.join(entry.path, rel_path), size) for rel_path, size, mtime in files]
+    else:
+        candidates = [(entry.path, entry.size)]
+    weighted = total = 0
+    for file_path, size in candidates:
+        try:
+            raw, packed = sample_file(file_path, size)
+        except OSError as e:
+            logging.error(f"Failed to sample {file_path}: {e}")
+            continue
+        if raw:
+            weighted += size * packed / raw
+            total += size
+    return weighted / total if total else 1.0
+
+
+def choose_level(ratio, compression_level):
+    if ratio >= STORE_RATIO:
+        return 0
+    if ratio >= CHEAP_RATIO:
+        return min(compression_level, CHEAP_LEVEL)
+    return compression_level
+
+
+def auto_level(entry, compression_level):
+    with span('sample', path=entry.path):
+        ratio = sample_ratio(entry)
+    level = choose_level(ratio, compression_level)
+    logging.info(localize('auto_level', file_path=entry.path, ratio=f"{ratio:.3f}", level=level, requested=compression_level))
+    return level
@@ -0,0 +1,149 @@
+import os
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from .trace import span
+
+SCAN_WORKERS = 8
+
+
+class TreeEntry:
+    def __init__(self, path, is_dir, size=0, mtime=0.0):
+        self.path = path
+        self.name = os.path.basename(path)
+        self.is_dir = is_dir
+        self.size = size
+        self.mtime = mtime
+        self.file_count = 0 if is_dir else 1
+        self.files = []  # (relative path, size, mtime) of every file below a directory entry
+        self.scan_seconds = 0.0
+
+    def __repr__(self):
+        return f"TreeEntry({self.path!r}, size={self.size}, files={self.file_count})"
+
+
+class TreeIndex:
+    def __init__(self, root, entries):
+        self.root = root
+        self.entries = entries
+
+    @property
+    def size(self):
+        return sum(entry.size for entry in self.entries)
+
+    @property
+    def file_count(self):
+        return sum(entry.file_count for entry in self.entries)
+
+    def dirs(self):
+        return [entry for entry in self.entries if entry.is_dir]
+
+    def files(self):
+        return [entry for entry in self.entries if not entry.is_dir]
+
+    def as_entry(self):
+        # The whole tree as one entry, for when the root itself is the unit of work
+        entry = TreeEntry(self.root, True, self.size, max([e.mtime for e in self.entries], default=0.0))
+        entry.file_count = self.file_count
+        entry.scan_seconds = sum(child.scan_seconds for child in self.entries)
+        for child in self.entries:
+            if child.is_dir:
+                entry.files.extend((os.path.join(child.name, rel_path), size, mtime) for rel_path, size, mtime in child.files)
+            else:
+                entry.files.append((child.name, child.size, child.mtime))
+        return entry
+
+    def get(self, path):
+        for entry in self.entries:
+            if entry.path == path:
+                return entry
+        return None
+
+
+def scan_tree(root, workers=SCAN_WORKERS, keep_files=True):
+    # One os.scandir traversal for the whole tree; every top-level subdirectory is summed on its own worker
+    with span('scan_tree', root=root):
+        return _scan_tree(root, workers, keep_files)
+
+
+def _scan_tree(root, workers, keep_files):
+    entries = []
+    pending = []
+    try:
+        with os.scandir(root) as it:
+            for dir_entry in it:
+                if dir_entry.is_dir(follow_symlinks=False):
+                    stat = _stat(dir_entry, follow_symlinks=False)
+                    entry = TreeEntry(dir_entry.path, True, mtime=stat.st_mtime if stat else 0.0)
+                    pending.append(entry)
+                else:
+                    stat = _stat(dir_entry)
+                    entry = TreeEntry(dir_entry.path, False, stat.st_size if stat else 0, stat.st_mtime if stat else 0.0)
+                entries.append(entry)
+    except OSError as e:
+        logging.error(f"Failed to scan directory {root}: {e}")
+
+    if workers > 1 and len(pending) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(lambda entry: _scan_dir(entry, keep_files), pending))
+    else:
+        for entry in pending:
+            _scan_dir(entry, keep_files)
+
+    entries.sort(key=lambda entry: entry.name)
+    return TreeIndex(root, entries)
+
+
+def file_entry(file_path):
+    stat = os.stat(file_path)
+    return TreeEntry(file_path, False, stat.st_size, stat.st_mtime)
+
+
+def input_size(file_path):
+    if os.path.isdir(file_path):
+        return scan_tree(file_path, keep_files=False).size
+    return os.path.getsize(file_path)
+
+
+def _scan_dir(entry, keep_files):
+    with span('scan_dir', path=entry.path):
+        return _walk_dir(entry, keep_files)
+
+
+def _walk_dir(entry, keep_files):
+    start = time.perf_counter()
+    stack = [entry.path]
+    prefix = len(entry.path) + 1
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                for dir_entry in it:
+                    if dir_entry.is_dir(follow_symlinks=False):
+                        stack.append(dir_entry.path)
+                        # A directory's mtime moves on create/delete/rename, so renames still show up in entry.mtime
+                        stat = _stat(dir_entry, follow_symlinks=False)
+                        if stat is not None:
+                            entry.mtime = max(entry.mtime, stat.st_mtime)
+                        continue
+                    stat = _stat(dir_entry)
+                    if stat is None:
+                        continue
+                    entry.size += stat.st_size
+                    entry.file_count += 1
+                    entry.mtime = max(entry.mtime, stat.st_mtime)
+                    if keep_files:
+                        entry.files.append((dir_entry.path[prefix:], stat.st_size, stat.st_mtime))
+        except OSError as e:
+            logging.error(f"Failed to get directory size for {current}: {e}")
+    entry.scan_seconds = time.perf_counter() - start
+    return entry
+
+
+def _stat(dir_entry, follow_symlinks=True):
+    # DirEntry caches the stat result, on Windows it comes straight from the directory listing
+    try:
+        return dir_entry.stat(follow_symlinks=follow_symlinks)
+    except OSError as e:
+        logging.error(f"Failed to stat {dir_entry.path}: {e}")
+        return None
@@ -0,0 +1,172 @@
+import os
+import sys
+import json
+import time
+import atexit
+import logging
+import threading
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+
+# Opt-in only: MEOWCAT_PROFILE=<dir> turns tracing on for any front end, the CLI also has --profile
+PROFILE_ENV = 'MEOWCAT_PROFILE'
+CPROFILE_ENV = 'MEOWCAT_PROFILE_CPROFILE'
+SAMPLE_ENV = 'MEOWCAT_PROFILE_SAMPLE_MS'
+
+_tracer = None
+
+
+class Tracer:
+    # Collects spans as Chrome trace "complete" events; open the file in chrome://tracing or ui.perfetto.dev
+    def __init__(self, output_dir, cprofile=False, sample_interval=None):
+        os.makedirs(output_dir, exist_ok=True)
+        self.base_path = os.path.join(output_dir, f"meowcat-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}")
+        self.origin = time.perf_counter()
+        self.events = []
+        self.threads = {}
+        self._lock = threading.Lock()
+        self.stats = None
+        self.cprofile = cprofile
+        self.main_profile = None
+        self._main_ident = threading.get_ident()
+        self.sample_interval = sample_interval
+        self.samples = Counter()
+        self._sampler = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        if self.cprofile:
+            # cProfile and pstats are only imported once profiling is switched on
+            import cProfile
+            self.main_profile = cProfile.Profile()
+            self.main_profile.enable()
+        if self.sample_interval:
+            self._sampler = threading.Thread(target=self._sample, name='meowcat-sampler', daemon=True)
+            self._sampler.start()
+
+    @contextmanager
+    def span(self, name, category='engine', **args):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            thread = threading.current_thread()
+            event = {"name": name, "cat": category, "ph": "X", "ts": (start - self.origin) * 1e6, "dur": (end - start) * 1e6,
+                     "pid": os.getpid(), "tid": thread.ident}
+            if args:
+                event["args"] = args
+            with self._lock:
+                self.events.append(event)
+                self.threads.setdefault(thread.ident, thread.name)
+
+    def profile(self, func):
+        # cProfile only sees the thread it was enabled on, so every worker job gets its own profile merged in afterwards
+        if not self.cprofile:
+            return func
+
+        import cProfile
+
+        def run(*args, **kwargs):
+            # Jobs run inline on the starting thread are already covered by its profile
+            if threading.get_ident() == self._main_ident:
+                return func(*args, **kwargs)
+            profile = cProfile.Profile()
+            profile.enable()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profile.disable()
+                self._merge(profile)
+        run.__name__ = getattr(func, '__name__', 'job')
+        return run
+
+    def _merge(self, profile):
+        import pstats
+        with self._lock:
+            if self.stats is None:
+                self.stats = pstats.Stats(profile)
+            else:
+                self.stats.add(profile)
+
+    def _sample(self):
+        # A poor man's sampling profiler: every interval, count the Python stack of every other thread
+        own = threading.get_ident()
+        while not self._stopped.wait(self.sample_interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(f"{frame.f_code.co_name} ({os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_firstlineno})")
+                    frame = frame.f_back
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stopped.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        if self.main_profile is not None:
+            self.main_profile.disable()
+            self._merge(self.main_profile)
+        written = []
+        with self._lock:
+            metadata = [{"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": ident, "args": {"name": name}}
+                        for ident, name in self.threads.items()]
+            trace_path = self.base_path + ".trace.json"
+            with open(trace_path, 'w', encoding='utf-8') as f:
+                json.dump({"traceEvents": metadata + self.events, "displayTimeUnit": "ms"}, f)
+            written.append(trace_path)
+            if self.stats is not None:
+                self.stats.dump_stats(self.base_path + ".pstats")
+                written.append(self.base_path + ".pstats")
+            if self.samples:
+                # Collapsed stacks, the input format of flamegraph.pl and speedscope
+                with open(self.base_path + ".folded", 'w', encoding='utf-8') as f:
+                    f.writelines(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+                written.append(self.base_path + ".folded")
+        return written
+
+
+def start_profiling(output_dir, cprofile=False, sample_interval=None):
+    global _tracer
+    if _tracer is not None:
+        return _tracer
+    _tracer = Tracer(output_dir, cprofile, sample_interval)
+    _tracer.start()
+    atexit.register(stop_profiling)
+    return _tracer
+
+
+def stop_profiling():
+    global _tracer
+    tracer, _tracer = _tracer, None
+    if tracer is None:
+        return []
+    try:
+        written = tracer.stop()
+    except OSError as e:
+        logging.error(f"Failed to write profile: {e}")
+        return []
+    for path in written:
+        logging.info(f"Profile written to {path}")
+    return written
+
+
+def enable_from_environment():
+    output_dir = os.environ.get(PROFILE_ENV)
+    if not output_dir:
+        return None
+    sample_ms = os.environ.get(SAMPLE_ENV)
+    return start_profiling(output_dir, os.environ.get(CPROFILE_ENV, '') not in ('', '0'), float(sample_ms) / 1000 if sample_ms else None)
+
+
+def span(name, category='engine', **args):
+    # Costs one global lookup when profiling is off
+    if _tracer is None:
+        return nullcontext()
+    return _tracer.span(name, category, **args)
+
+
+def profiled(func):
+    return func if _tracer is None else _tracer.profile(func)
@@ -0,0 +1,152 @@
+import os
+import lzma
+import time
+import logging
+import tarfile
+import zipfile
+import subprocess
+from .pool import run_jobs, cpu_budget, threads_per_job
+from .process import run_command, JobCancelled
+from .checksum import hash_file, HASH_ALGORITHMS
+from .manifest import InputManifest
+from .restore import read_info, discover_archives, archive_backend, archive_signature, VolumeReader, COPY_CHUNK
+from .trace import span
+from .i18n import localize
+
+
+class VerifyResult:
+    def __init__(self, path, backend, size, ok, errors=None, cached=False, seconds=0.0):
+        self.path = path
+        self.backend = backend
+        self.size = size
+        self.ok = ok
+        self.errors = errors or []
+        self.cached = cached
+        self.seconds = seconds
+
+    def as_dict(self):
+        return dict(self.__dict__)
+
+
+def check_parts(path, info):
+    # Volume sizes and checksums against info.json; returns a list of problems
+    errors = []
+    for part in info.get("parts", []):
+        part_path = os.path.join(path, part["part_name"])
+        if not os.path.exists(part_path):
+            errors.append(f"{part['part_name']} is missing")
+            continue
+        size = os.path.getsize(part_path)
+        if size != part["part_size"]:
+            errors.append(f"{part['part_name']} is {size} bytes, info.json says {part['part_size']}")
+            continue
+        expected = {name: digest for name, digest in part.get("checksums", {}).items() if name in HASH_ALGORITHMS}
+        if expected:
+            actual = hash_file(part_path, tuple(expected))
+            errors.extend(f"{part['part_name']} {name} mismatch" for name in expected if actual[name] != expected[name])
+    return errors
+
+
+def test_tar_xz(reader, cancel=None):
+    # Decoding everything checks every xz block CRC and the tar structure
+    with lzma.LZMAFile(reader) as stream, tarfile.open(fileobj=stream, mode='r|') as tar:
+        for info in tar:
+            if cancel is not None:
+                cancel.check()
+            if info.isreg():
+                source = tar.extractfile(info)
+                while source.read(COPY_CHUNK):
+                    if cancel is not None:
+                        cancel.check()
+
+
+def test_zip(reader):
+    with zipfile.ZipFile(reader) as archive:
+        bad = archive.testzip()
+    if bad is not None:
+        raise zipfile.BadZipFile(f"CRC mismatch in {bad}")
+
+
+def test_archive(path, backend, parts, password=None, threads=None, cancel=None):
+    if backend == '7z':
+        # 7z finds the other volumes next to the first one
+        command = ['7z', 't', os.path.join(path, parts[0]["part_name"]) if parts else path, '-y']
+        # -p is always given, empty without a password, so 7z never prompts for one on an archive with encrypted names
+        command[2:2] = ['-p{}'.format(password or '')]
+        if threads:
+            command[2:2] = ['-mmt{}'.format(threads)]
+        run_command(command, cancel)
+        return
+    reader = VolumeReader(path, parts) if parts else VolumeReader(os.path.dirname(path), [{"part_name": os.path.basename(path), "part_size": os.path.getsize(path)}])
+    try:
+        if backend == 'xz':
+            test_tar_xz(reader, cancel)
+        else:
+            test_zip(reader)
+    finally:
+        reader.close()
+
+
+def verify_archive(path, password=None, threads=None, cancel=None):
+    start = time.perf_counter()
+    size, _ = archive_signature(path)
+    errors = []
+    backend = None
+    try:
+        with span('verify', archive=path):
+            if os.path.isdir(path):
+                info = read_info(path)
+                backend = info.get("backend", '7z')
+                parts = info.get("parts", [])
+                errors = check_parts(path, info)
+            else:
+                backend = archive_backend(path)
+                parts = []
+            # Missing or truncated parts would only make the archive test fail less clearly
+            if not errors:
+                test_archive(path, backend, parts, password, threads, cancel)
+    except JobCancelled:
+        raise
+    except (OSError, ValueError, KeyError, lzma.LZMAError, tarfile.TarError, zipfile.BadZipFile, subprocess.CalledProcessError) as e:
+        errors.append(str(e))
+    result = VerifyResult(path, backend, size, not errors, errors, seconds=time.perf_counter() - start)
+    if result.ok:
+        logging.info(localize('archive_verified', archive=path))
+    else:
+        logging.error(localize('archive_invalid', archive=path, error='; '.join(errors)))
+    return result
+
+
+def verify_outputs(output_dir, max_workers=None, password=None, use_cache=True, cancel=None):
+    # Tests every archive under output_dir, max_workers at a time; archives that passed before and have not changed are skipped
+    max_workers = max_workers or cpu_budget()
+    threads = threads_per_job(max_workers)
+    archives = discover_archives(output_dir)
+    results = []
+    jobs = []
+    with InputManifest(output_dir) as manifest:
+        def run(path, size, mtime):
+            try:
+                result = verify_archive(path, password, threads, cancel)
+            except JobCancelled:
+                return None
+            if result.ok:
+                manifest.record_verified(path, size, mtime)
+            else:
+                manifest.forget_verified(path)
+            return result
+
+        for path in archives:
+            size, mtime = archive_signature(path)
+            if use_cache and manifest.is_verified(path, size, mtime):
+                results.append(VerifyResult(path, None, size, True, cached=True))
+                continue
+            jobs.append((size, run, (path, size, mtime)))
+        started = time.perf_counter()
+        # Cancelled jobs come back as None or False and are simply not reported
+        results.extend(result for result in run_jobs(jobs, max_workers, cancel) if isinstance(result, VerifyResult))
+        seconds = time.perf_counter() - started
+    failed = sum(1 for result in results if not result.ok)
+    cached = sum(1 for result in results if result.cached)
+    logging.info(localize('verify_summary', count=len(results), failed=failed, cached=cached, seconds=f"{seconds:.1f}"))
+    return results
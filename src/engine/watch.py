@@ -0,0 +1,357 @@
+import os
+import sys
+import time
+import queue
+import ctypes
+import select
+import struct
+import logging
+import threading
+from .jobqueue import QueuedJob, JOB_OPTIONS, run_queued_job
+from .metrics import publish
+from .process import CancelToken
+from .i18n import localize
+
+# An input is archived once it has looked the same (size, mtime, file count) for this long
+SETTLE_SECONDS = 2.0
+POLL_INTERVAL = 1.0
+# Polling only sees an archived directory's own stat move when entries directly inside it change, so it walks archived
+# directories in full this often to pick up changes further down
+DEEP_RESCAN_SECONDS = 30.0
+BACKLOG = 16
+METRICS_INTERVAL = 1.0
+# Names that writers use while a file is still in flight; the final rename is what gets picked up
+PARTIAL_SUFFIXES = ('.part', '.partial', '.tmp', '.crdownload', '.download', '.filepart', '.!qb')
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+EVENT_HEADER = struct.Struct('iIII')
+
+
+def ignored(name):
+    return name.startswith('.') or name.startswith('~$') or name.lower().endswith(PARTIAL_SUFFIXES)
+
+
+def input_signature(path):
+    # Changes while anything below path is still being written; None once it is gone
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    if not os.path.isdir(path):
+        return (stat.st_size, stat.st_mtime_ns, 1)
+    size, mtime, count = 0, stat.st_mtime_ns, 0
+    for root, dirs, files in os.walk(path):
+        for name in files:
+            try:
+                file_stat = os.stat(os.path.join(root, name))
+            except OSError:
+                continue
+            size += file_stat.st_size
+            mtime = max(mtime, file_stat.st_mtime_ns)
+            count += 1
+        for name in dirs:
+            try:
+                mtime = max(mtime, os.stat(os.path.join(root, name)).st_mtime_ns)
+            except OSError:
+                continue
+    return (size, mtime, count)
+
+
+def top_stat(path):
+    # The input's own stat: cheap, and for a directory it only moves when entries directly inside it come or go
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+
+def list_inputs(directory):
+    try:
+        return [entry.path for entry in os.scandir(directory) if not ignored(entry.name)]
+    except OSError as e:
+        logging.error(f"Failed to list {directory}: {e}")
+        return []
+
+
+class PollingWatcher:
+    # Works everywhere: every wait is a full rescan of the watched directories
+    def __init__(self, directories, interval=POLL_INTERVAL):
+        self.directories = directories
+        self.interval = interval
+
+    def wait(self, timeout):
+        # None means "rescan everything"
+        time.sleep(min(timeout, self.interval))
+        return None
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    # Linux inotify through libc, watching every directory below the watched ones so writes deep inside a dropped
+    # directory still reset its debounce. wait() returns the changed top-level inputs, or None when the kernel queue overflowed.
+    def __init__(self, directories):
+        self.libc = ctypes.CDLL(None, use_errno=True)
+        self.libc.inotify_add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.watches = {}  # wd -> (watched directory, directory the wd is on)
+        self.directories = directories
+        for directory in directories:
+            self.add_tree(directory, directory)
+
+    def add_tree(self, root, path):
+        for current, dirs, files in os.walk(path):
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(current), WATCH_MASK)
+            if wd < 0:
+                logging.warning(f"Cannot watch {current}: {os.strerror(ctypes.get_errno())}")
+                continue
+            self.watches[wd] = (root, current)
+
+    def wait(self, timeout):
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+        changed = set()
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset < len(data):
+                wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+                name = os.fsdecode(data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b'\0'))
+                offset += EVENT_HEADER.size + length
+                if mask & IN_Q_OVERFLOW:
+                    return None
+                if mask & IN_IGNORED:
+                    self.watches.pop(wd, None)
+                    continue
+                if wd not in self.watches:
+                    continue
+                root, directory = self.watches[wd]
+                path = os.path.join(directory, name) if name else directory
+                if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                    self.add_tree(root, path)
+                relative = os.path.relpath(path, root)
+                if relative != os.curdir:
+                    changed.add(os.path.join(root, relative.split(os.sep)[0]))
+
+    def close(self):
+        os.close(self.fd)
+
+
+def make_watcher(directories, polling=False, interval=POLL_INTERVAL):
+    if not polling and sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(directories)
+        except (OSError, AttributeError) as e:
+            logging.warning(f"inotify is not available ({e}), polling every {interval}s instead")
+    return PollingWatcher(directories, interval)
+
+
+class WatchStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.held = 0
+        self.queued = 0
+        self.running = 0
+        self.done = 0
+        self.failed = 0
+        self.held_seconds = 0.0
+        self.latency = 0.0
+
+    def as_metrics(self):
+        with self.lock:
+            return {
+                'meowcat_watch_pending_inputs': ('gauge', "Inputs seen but still being written.", self.pending),
+                'meowcat_watch_held_inputs': ('gauge', "Settled inputs waiting because the backlog is full.", self.held),
+                'meowcat_watch_backlog_inputs': ('gauge', "Settled inputs queued for a worker.", self.queued),
+                'meowcat_watch_running_inputs': ('gauge', "Inputs being archived.", self.running),
+                'meowcat_watch_archived_total': ('counter', "Inputs archived by the watcher.", self.done),
+                'meowcat_watch_failed_total': ('counter', "Inputs the watcher failed to archive.", self.failed),
+                'meowcat_watch_backpressure_seconds_total': ('counter', "Time settled inputs spent held back by a full backlog.",
+                                                             round(self.held_seconds, 3)),
+                'meowcat_watch_last_latency_seconds': ('gauge', "Seconds from an input's last change to its archive being written.",
+                                                       round(self.latency, 3))
+            }
+
+
+def watch_directories(directories, output_dir, options=None, password=None, max_workers=1, backlog=BACKLOG, settle=SETTLE_SECONDS,
+                      polling=False, poll_interval=POLL_INTERVAL, cancel=None, progress=None):
+    # Runs until cancel is set. Every top-level entry of a watched directory is one input: a file goes through copy_file,
+    # a directory through process_directory, with the same options as a queued job. Inputs already in the manifest and
+    # unchanged are skipped there, so restarting the watcher over a full directory is cheap.
+    options = dict(JOB_OPTIONS, **(options or {}))
+    cancel = cancel or CancelToken()
+    directories = [os.path.abspath(directory) for directory in directories]
+    output_dir = os.path.abspath(output_dir)
+    for directory in directories:
+        if output_dir == directory or output_dir.startswith(directory + os.sep):
+            raise ValueError(f"Output directory {output_dir} is inside the watched directory {directory}")
+    # Several watched directories get one output subdirectory each, so equal names cannot collide
+    targets = {directory: output_dir if len(directories) == 1 else os.path.join(output_dir, os.path.basename(directory))
+               for directory in directories}
+    stats = WatchStats()
+    jobs = queue.Queue(maxsize=max(1, backlog))
+    pending = {}  # path -> [signature, changed since, top stat]
+    held = {}     # path -> (signature, top stat, changed since, held since); settled but the backlog is full
+    archived = {}  # path -> (signature, top stat) it was archived with
+    active = set()
+
+    def worker():
+        while True:
+            item = jobs.get()
+            if item is None:
+                return
+            path, signature, top, changed = item
+            with stats.lock:
+                stats.queued -= 1
+                stats.running += 1
+            root = os.path.dirname(path)
+            try:
+                ok = run_queued_job(QueuedJob(None, path, targets[root], options, 1), password, cancel, progress)
+                error = None if ok else "compression failed"
+            except Exception as e:
+                ok = False
+                error = str(e)
+            with stats.lock:
+                stats.running -= 1
+                active.discard(path)
+                if cancel.cancelled:
+                    continue
+                if ok:
+                    stats.done += 1
+                    stats.latency = time.time() - changed
+                    archived[path] = (signature, top)
+                else:
+                    stats.failed += 1
+            if ok:
+                logging.info(localize('watch_archived', input=path, seconds=f"{time.time() - changed:.1f}"))
+            else:
+                logging.error(localize('watch_failed', input=path, error=error))
+
+    def offer(path, signature, top, changed):
+        try:
+            jobs.put_nowait((path, signature, top, changed))
+        except queue.Full:
+            return False
+        with stats.lock:
+            stats.queued += 1
+            active.add(path)
+        return True
+
+    for directory in directories:
+        os.makedirs(targets[directory], exist_ok=True)
+    watcher = make_watcher(directories, polling, poll_interval)
+    logging.info(localize('watch_started', directories=', '.join(directories), output_dir=output_dir,
+                          mode='inotify' if isinstance(watcher, InotifyWatcher) else 'polling'))
+    workers = [threading.Thread(target=worker, name=f'meowcat-watch-{n}') for n in range(max(1, max_workers))]
+    for thread in workers:
+        thread.start()
+    changed = None
+    inotify = isinstance(watcher, InotifyWatcher)
+    last_deep = time.time()
+    last_metrics = 0.0
+    last_tick = time.time()
+    try:
+        while not cancel.cancelled:
+            now = time.time()
+            if changed is None:
+                listed = {path for directory in directories for path in list_inputs(directory)}
+                # Forget inputs that were removed, so a new drop under the same name is archived again
+                for path in [path for path in archived if path not in listed]:
+                    del archived[path]
+                # A rescan normally only walks archived inputs again when their own stat moved. After an inotify
+                # overflow the lost events may have been anywhere below them, and polling has no events at all, so
+                # those rescans also compare archived inputs' full signatures, polling every DEEP_RESCAN_SECONDS.
+                deep = inotify or now - last_deep >= DEEP_RESCAN_SECONDS
+                if deep:
+                    last_deep = now
+                changed = {path for path in listed if path not in archived or archived[path][1] != top_stat(path)
+                           or (deep and archived[path][0] != input_signature(path))}
+            for path in changed:
+                if not ignored(os.path.basename(path)) and path not in held:
+                    pending.setdefault(path, [None, now, None])
+
+            # Debounce: an input is ready once its signature has not moved for `settle` seconds
+            ready = []
+            for path, state in list(pending.items()):
+                top = top_stat(path)
+                signature = input_signature(path)
+                if signature is None:
+                    del pending[path]
+                elif signature != state[0]:
+                    state[0], state[1], state[2] = signature, now, top
+                elif now - state[1] >= settle:
+                    del pending[path]
+                    with stats.lock:
+                        busy = path in active
+                    if busy or archived.get(path, (None,))[0] == signature:
+                        continue
+                    ready.append((path, signature, state[2], state[1]))
+
+            # Held inputs go first, so a full backlog delays inputs without reordering them
+            backpressure = bool(held)
+            for path, (signature, top, since, held_since) in list(held.items()):
+                if not offer(path, signature, top, since):
+                    break
+                del held[path]
+                logging.info(localize('watch_queued', input=path))
+            for path, signature, top, since in ready:
+                if held or not offer(path, signature, top, since):
+                    if not held:
+                        logging.warning(localize('watch_backlog_full', backlog=jobs.maxsize))
+                    held[path] = (signature, top, since, now)
+                else:
+                    logging.info(localize('watch_queued', input=path))
+            with stats.lock:
+                if backpressure:
+                    stats.held_seconds += now - last_tick
+                # An event can put an archived input back under watch; it is not waiting for anything
+                stats.pending = sum(1 for path in pending if path not in archived)
+                stats.held = len(held)
+            last_tick = now
+            if now - last_metrics >= METRICS_INTERVAL:
+                publish(stats.as_metrics())
+                last_metrics = now
+
+            # Sleep until the next event, or until the soonest pending input could have settled
+            timeout = min([max(0.05, settle - (now - state[1])) for state in pending.values()] + [poll_interval if held else settle])
+            changed = watcher.wait(timeout)
+    except BaseException:
+        # Ctrl-C and errors stop the running 7z processes too; their partial outputs are removed as for any cancel
+        cancel.cancel()
+        raise
+    finally:
+        watcher.close()
+        # Queued inputs are still on disk and are picked up again on the next start
+        while True:
+            try:
+                jobs.get_nowait()
+            except queue.Empty:
+                break
+        for _ in workers:
+            jobs.put(None)
+        for thread in workers:
+            thread.join()
+        publish(stats.as_metrics())
+    return stats
@@ -1,56 +1,61 @@
-import os
 import sys
-import json
-import glob
-import time
-import shutil
-import random
-import winreg
-import hashlib
-import subprocess
-from enum import Enum
-from pathlib import Path
-from typing import Union, List
-from PySide6.QtCore import Qt, Signal, QLocale, QSize, QModelIndex, QRect, QTimer, QUrl, QProcess
-from PySide6.QtGui import QIntValidator, QColor, QIcon, QPainter, QFont, QPixmap, QPainterPath, QDesktopServices
-from PySide6.QtWidgets import (QWidget, QVBoxLayout, QLabel, QStackedWidget, QHBoxLayout, QApplication,
-                               QTableWidgetItem, QHeaderView, QAbstractItemView, QButtonGroup,
-                                QFrame, QFileDialog, QStyleOptionViewItem, QSizePolicy)
-from qfluentwidgets.components.dialog_box.mask_dialog_base import MaskDialogBase
-from qfluentwidgets import (Pivot, qrouter, ScrollArea, PrimaryPushSettingCard, InfoBar, HyperlinkButton,
-                            InfoBarPosition, SwitchSettingCard, LineEdit, PrimaryPushButton, FluentIcon,
-                            PasswordLineEdit, InfoBarIcon, qconfig, QConfig, Theme, ConfigItem, BoolValidator,
-                            OptionsValidator, OptionsConfigItem, ConfigSerializer, FolderValidator, TitleLabel,
-                            FluentStyleSheet, FluentIconBase, IconWidget, isDarkTheme, drawIcon, ComboBox,
-                            MessageBoxBase, SubtitleLabel, FlyoutViewBase, BodyLabel, ExpandLayout, setThemeColor,
-                            StyleSheetBase, TogglePushButton, TableWidget, SearchLineEdit, PrimaryToolButton,
-                            PrimaryToolButton, HorizontalPipsPager, PipsScrollButtonDisplayMode, PopupTeachingTip,
-                            setCustomStyleSheet, FlowLayout, HorizontalFlipView, FlipImageDelegate, Dialog,
-                            HyperlinkCard, MSFluentWindow, NavigationItemPosition, setTheme, SplashScreen,
-                            TeachingTipTailPosition, CustomColorSettingCard, PushButton, ComboBoxSettingCard,
-                            ExpandSettingCard, ConfigValidator, ColorConfigItem, SmoothScrollArea)
-
-
-__all__ = [
-    'os', 'sys', 'json', 'glob', 'time', 'shutil', 'random', 'winreg', 'hashlib', 'subprocess',
-
-    'Enum', 'Path', 'Union', 'List', 'MaskDialogBase',
-
-    'Qt', 'Signal', 'QLocale', 'QSize', 'QModelIndex', 'QRect', 'QTimer', 'QUrl', 'QProcess',
-    'QIntValidator', 'QColor', 'QIcon', 'QPainter', 'QFont', 'QPixmap', 'QPainterPath', 'QDesktopServices',
-    'QWidget', 'QVBoxLayout', 'QLabel', 'QStackedWidget', 'QHBoxLayout', 'QApplication', 'QTableWidgetItem',
-    'QHeaderView', 'QAbstractItemView', 'QButtonGroup', 'QFrame', 'QFileDialog', 'QStyleOptionViewItem', 'QSizePolicy',
-
-    'Pivot', 'qrouter', 'ScrollArea', 'PrimaryPushSettingCard', 'InfoBar', 'HyperlinkButton',
-    'InfoBarPosition', 'SwitchSettingCard', 'LineEdit', 'PrimaryPushButton', 'FluentIcon',
-    'PasswordLineEdit', 'InfoBarIcon', 'qconfig', 'QConfig', 'Theme', 'ConfigItem', 'BoolValidator',
-    'OptionsValidator', 'OptionsConfigItem', 'ConfigSerializer', 'FolderValidator', 'TitleLabel',
-    'FluentStyleSheet', 'FluentIconBase', 'IconWidget', 'isDarkTheme', 'drawIcon', 'ComboBox',
-    'MessageBoxBase', 'SubtitleLabel', 'FlyoutViewBase', 'BodyLabel', 'ExpandLayout', 'setThemeColor',
-    'StyleSheetBase', 'TogglePushButton', 'TableWidget', 'SearchLineEdit', 'PrimaryToolButton',
-    'PrimaryToolButton', 'HorizontalPipsPager', 'PipsScrollButtonDisplayMode', 'PopupTeachingTip',
-    'setCustomStyleSheet', 'FlowLayout', 'HorizontalFlipView', 'FlipImageDelegate', 'Dialog',
-    'HyperlinkCard', 'MSFluentWindow', 'NavigationItemPosition', 'setTheme', 'SplashScreen',
-    'TeachingTipTailPosition', 'CustomColorSettingCard', 'PushButton', 'ComboBoxSettingCard',
-    'ExpandSettingCard', 'ConfigValidator', 'ColorConfigItem', 'SmoothScrollArea'
-]
+from importlib import import_module
+
+# Nothing below is imported until a name is first used: `from src.importer import QWidget` pulls in
+# PySide6.QtWidgets and nothing else, so startup only pays for what the first window needs.
+# `python -m src.importer` reports what each import costs.
+
+_MODULES = ('os', 'sys', 'json', 'glob', 'time', 'shutil', 'random', 'winreg', 'hashlib', 'subprocess')
+
+# Modules that only exist on one platform resolve to None everywhere else
+_PLATFORM_MODULES = {'winreg': 'win32'}
+
+_SYMBOLS = {
+    'enum': ('Enum',),
+    'pathlib': ('Path',),
+    'typing': ('Union', 'List'),
+    'qfluentwidgets.components.dialog_box.mask_dialog_base': ('MaskDialogBase',),
+    'PySide6.QtCore': ('Qt', 'Signal', 'QLocale', 'QSize', 'QModelIndex', 'QRect', 'QTimer', 'QUrl', 'QProcess'),
+    'PySide6.QtGui': ('QIntValidator', 'QColor', 'QIcon', 'QPainter', 'QFont', 'QPixmap', 'QPainterPath', 'QDesktopServices',
+                      'QImage'),
+    'PySide6.QtWidgets': ('QWidget', 'QVBoxLayout', 'QLabel', 'QStackedWidget', 'QHBoxLayout', 'QApplication', 'QTableWidgetItem',
+                          'QHeaderView', 'QAbstractItemView', 'QButtonGroup', 'QFrame', 'QFileDialog', 'QStyleOptionViewItem', 'QSizePolicy'),
+    'qfluentwidgets': ('Pivot', 'qrouter', 'ScrollArea', 'PrimaryPushSettingCard', 'InfoBar', 'HyperlinkButton',
+                       'InfoBarPosition', 'SwitchSettingCard', 'LineEdit', 'PrimaryPushButton', 'FluentIcon',
+                       'PasswordLineEdit', 'InfoBarIcon', 'qconfig', 'QConfig', 'Theme', 'ConfigItem', 'BoolValidator',
+                       'OptionsValidator', 'OptionsConfigItem', 'ConfigSerializer', 'FolderValidator', 'TitleLabel',
+                       'FluentStyleSheet', 'FluentIconBase', 'IconWidget', 'isDarkTheme', 'drawIcon', 'ComboBox',
+                       'MessageBoxBase', 'SubtitleLabel', 'FlyoutViewBase', 'BodyLabel', 'ExpandLayout', 'setThemeColor',
+                       'StyleSheetBase', 'TogglePushButton', 'TableWidget', 'SearchLineEdit', 'PrimaryToolButton',
+                       'HorizontalPipsPager', 'PipsScrollButtonDisplayMode', 'PopupTeachingTip',
+                       'setCustomStyleSheet', 'FlowLayout', 'HorizontalFlipView', 'FlipImageDelegate', 'Dialog',
+                       'HyperlinkCard', 'MSFluentWindow', 'NavigationItemPosition', 'setTheme', 'SplashScreen',
+                       'TeachingTipTailPosition', 'CustomColorSettingCard', 'PushButton', 'ComboBoxSettingCard',
+                       'ExpandSettingCard', 'ConfigValidator', 'ColorConfigItem', 'SmoothScrollArea')
+}
+
+_SOURCES = {name: module for module, names in _SYMBOLS.items() for name in names}
+
+# `from src.importer import *` still works, but it resolves every name below; prefer importing names explicitly
+__all__ = list(_MODULES) + list(_SOURCES)
+
+
+def available(name):
+    platform = _PLATFORM_MODULES.get(name)
+    return platform is None or sys.platform == platform
+
+
+def __getattr__(name):
+    if name in _MODULES:
+        value = import_module(name) if available(name) else None
+    elif name in _SOURCES:
+        value = getattr(import_module(_SOURCES[name]), name)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    # Cached as a real module global, so later lookups never come back here
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,81 @@
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+DEFAULT_TARGETS = ('src.importer', 'src.module', 'src.app.main')
+
+
+def parse_importtime(text):
+    # -X importtime writes "import time: self [us] | cumulative | imported package", nested imports indented by two spaces
+    modules = []
+    for line in text.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        modules.append({"module": name.strip(), "self_us": int(self_us), "cumulative_us": int(cumulative_us), "depth": depth})
+    return modules
+
+
+def measure_import(target, runs=3):
+    # Each run is a fresh interpreter, so nothing is cached in sys.modules; the fastest run is the least noisy
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {target}'], cwd=ROOT, capture_output=True, text=True)
+        wall = time.perf_counter() - start
+        if result.returncode != 0:
+            error = result.stderr.strip().splitlines()
+            return {"target": target, "error": error[-1] if error else f"exit code {result.returncode}"}
+        modules = parse_importtime(result.stderr)
+        total_us = sum(module["cumulative_us"] for module in modules if module["depth"] == 0)
+        if best is None or total_us < best["total_us"]:
+            best = {"target": target, "wall_seconds": wall, "total_us": total_us, "modules": modules}
+    return best
+
+
+def format_report(report, top=15):
+    lines = []
+    for result in report:
+        if "error" in result:
+            lines.append(f"{result['target']}: failed to import ({result['error']})")
+            lines.append("")
+            continue
+        lines.append(f"{result['target']}: {result['total_us'] / 1000:.1f} ms of imports, "
+                     f"{result['wall_seconds'] * 1000:.1f} ms including interpreter start, {len(result['modules'])} modules")
+        lines.append(f"{'cumulative':>12} {'self':>10}  module")
+        for module in sorted(result["modules"], key=lambda m: m["cumulative_us"], reverse=True)[:top]:
+            lines.append(f"{module['cumulative_us'] / 1000:10.1f}ms {module['self_us'] / 1000:8.1f}ms  {'  ' * module['depth']}{module['module']}")
+        lines.append("")
+    return '\n'.join(lines)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m src.importer', description="Report the cold-start import cost of the MeowCatCompress front end")
+    parser.add_argument('targets', nargs='*', default=list(DEFAULT_TARGETS), help="modules to import, each in a fresh interpreter")
+    parser.add_argument('--runs', type=int, default=3, help="best of this many runs is reported")
+    parser.add_argument('--top', type=int, default=15, help="slowest modules listed per target")
+    parser.add_argument('--budget-ms', type=float, help="exit with 1 when any target's imports take longer than this")
+    parser.add_argument('--json', action='store_true', help="print the full report as JSON")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    report = [measure_import(target, max(1, args.runs)) for target in args.targets]
+    if args.json:
+        print(json.dumps(report, indent=4))
+    else:
+        print(format_report(report, args.top))
+    if any("error" in result for result in report):
+        return 2
+    if args.budget_ms is not None and any(result["total_us"] / 1000 > args.budget_ms for result in report):
+        return 1
+    return 0
+
+
+sys.exit(main())
@@ -2,8 +2,11 @@ from .config import cfg, open_file, Info
 from .style_sheet import StyleSheet
 from .setting_card import SettingCard, SettingCardGroup
 from .list_setting_card import ListSettingCard
+from .lazy_page import LazyPage
+from .pixmap_cache import PixmapCache, pixmapCache
 
 __all__ = [
     'cfg', 'open_file', 'Info', 'ListSettingCard',
-    'StyleSheet', 'SettingCard', 'SettingCardGroup'
+    'StyleSheet', 'SettingCard', 'SettingCardGroup', 'LazyPage',
+    'PixmapCache', 'pixmapCache'
 ]
\ No newline at end of file
@@ -1,4 +1,7 @@
-from src.importer import *
+import os
+from enum import Enum
+from src.importer import (Qt, QLocale, QColor, InfoBar, InfoBarPosition, qconfig, QConfig, OptionsValidator,
+                          OptionsConfigItem, ConfigSerializer, ConfigItem, BoolValidator)
 from .validator import ExeValidator, ExeListValidator, StringValidator
 
 
@@ -70,11 +73,16 @@ class Config(QConfig):
         "Style", "DpiScale", "Auto", OptionsValidator([1, 1.25, 1.5, 1.75, 2, "Auto"]), restart=True)
     language = OptionsConfigItem(
         "Style", "Language", Language.ENGLISH, OptionsValidator(Language), LanguageSerializer(), restart=True)
+    pixmapCacheSize = OptionsConfigItem(
+        "Performance", "PixmapCacheSize", 64, OptionsValidator([16, 32, 64, 128, 256]), restart=True)
+    pixmapDiskCache = ConfigItem(
+        "Performance", "PixmapDiskCache", True, BoolValidator(), restart=True)
 
     ############### APP INFO ###############
     ROOT = os.getcwd()
     IMAGE = os.path.join(ROOT, 'data/image')
     ICON = os.path.join(ROOT, 'data/image/icon.ico')
+    CACHE = os.path.join(ROOT, 'cache/pixmap')
 
     APP_NAME = "MeowCatCompress"
     APP_VERSION = get_version_type("v1.0.0")
@@ -0,0 +1,27 @@
+from src.importer import Signal, QWidget, QVBoxLayout
+from src.engine import span
+
+
+class LazyPage(QWidget):
+    # Holds a navigation slot for a page that is only built the first time it is shown
+    pageCreated = Signal(QWidget)
+
+    def __init__(self, text: str, factory, parent=None):
+        super().__init__(parent=parent)
+        self.setObjectName(text)
+        self.factory = factory
+        self.page = None
+        self.vBoxLayout = QVBoxLayout(self)
+        self.vBoxLayout.setContentsMargins(0, 0, 0, 0)
+
+    def showEvent(self, event):
+        self.ensurePage()
+        super().showEvent(event)
+
+    def ensurePage(self):
+        if self.page is None:
+            with span('create_page', 'gui', page=self.objectName()):
+                self.page = self.factory(self.objectName(), self)
+                self.vBoxLayout.addWidget(self.page)
+            self.pageCreated.emit(self.page)
+        return self.page
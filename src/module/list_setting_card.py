@@ -1,4 +1,5 @@
-from src.importer import *
+from src.importer import (Qt, Signal, QSize, QWidget, QLabel, QHBoxLayout, QFileDialog, QSizePolicy, FluentIcon, qconfig,
+                          ConfigItem, PrimaryToolButton, PushButton, ExpandSettingCard)
 
 
 class ListItem(QWidget):
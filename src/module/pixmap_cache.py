@@ -0,0 +1,96 @@
+import os
+import hashlib
+from collections import OrderedDict
+from src.importer import Qt, QImage, QPixmap
+from .config import cfg
+
+MB = 1024 * 1024
+
+
+class PixmapCache:
+    # Decodes each asset once and keeps pixmaps pre-scaled to (asset, device pixel ratio, size), so a repaint is a plain blit.
+    # Everything shares one memory budget and the least recently used entry goes first; scaled variants can also be kept on disk.
+    def __init__(self, root, budget=64 * MB, diskCache=None):
+        self.root = root
+        self.budget = budget
+        self.diskCache = diskCache
+        self.entries = OrderedDict()
+        self.used = 0
+
+    def image(self, name):
+        key = (name,)
+        image = self.__get(key)
+        if image is None:
+            image = QImage(os.path.join(self.root, name))
+            self.__put(key, image, image.sizeInBytes())
+        return image
+
+    def pixmap(self, name, size, ratio=1.0, aspectMode=Qt.IgnoreAspectRatio):
+        # size is in device-independent pixels; the pixmap is rendered at size * ratio and tagged with the ratio
+        width, height = round(size.width() * ratio), round(size.height() * ratio)
+        key = (name, ratio, width, height, aspectMode)
+        pixmap = self.__get(key)
+        if pixmap is None:
+            pixmap = self.__load(name, width, height, aspectMode)
+            if pixmap is None:
+                image = self.image(name).scaled(width, height, aspectMode, Qt.SmoothTransformation)
+                pixmap = QPixmap.fromImage(image)
+                self.__save(name, width, height, aspectMode, pixmap)
+            pixmap.setDevicePixelRatio(ratio)
+            self.__put(key, pixmap, pixmap.width() * pixmap.height() * max(pixmap.depth(), 8) // 8)
+        return pixmap
+
+    def clear(self):
+        self.entries.clear()
+        self.used = 0
+
+    def __get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        self.entries.move_to_end(key)
+        return entry[0]
+
+    def __put(self, key, value, cost):
+        self.entries[key] = (value, cost)
+        self.used += cost
+        # The entry just added always stays, even when it alone is over budget
+        while self.used > self.budget and len(self.entries) > 1:
+            _, (_, evicted) = self.entries.popitem(last=False)
+            self.used -= evicted
+
+    def __diskPath(self, name, width, height, aspectMode):
+        # Keyed on the source's size and mtime as well, so replacing an asset never serves a stale variant
+        try:
+            stat = os.stat(os.path.join(self.root, name))
+        except OSError:
+            return None
+        digest = hashlib.sha1(f"{name}:{stat.st_size}:{stat.st_mtime_ns}:{aspectMode.name}".encode()).hexdigest()[:16]
+        return os.path.join(self.diskCache, f"{os.path.splitext(name)[0]}-{width}x{height}-{digest}.png")
+
+    def __load(self, name, width, height, aspectMode):
+        if not self.diskCache:
+            return None
+        path = self.__diskPath(name, width, height, aspectMode)
+        if path is None or not os.path.exists(path):
+            return None
+        pixmap = QPixmap(path)
+        return None if pixmap.isNull() else pixmap
+
+    def __save(self, name, width, height, aspectMode, pixmap):
+        if not self.diskCache:
+            return
+        path = self.__diskPath(name, width, height, aspectMode)
+        if path is None:
+            return
+        try:
+            os.makedirs(self.diskCache, exist_ok=True)
+            # Written beside the target and swapped in, so a crash never leaves half a PNG to load next time
+            tmpPath = path + '.tmp'
+            if pixmap.save(tmpPath, 'PNG'):
+                os.replace(tmpPath, path)
+        except OSError:
+            pass
+
+
+pixmapCache = PixmapCache(cfg.IMAGE, cfg.get(cfg.pixmapCacheSize) * MB, cfg.CACHE if cfg.get(cfg.pixmapDiskCache) else None)
@@ -1,4 +1,6 @@
-from src.importer import *
+from typing import Union, List
+from src.importer import (Qt, QColor, QIcon, QPainter, QWidget, QVBoxLayout, QLabel, QHBoxLayout, QFrame,
+                          FluentStyleSheet, FluentIconBase, IconWidget, isDarkTheme, drawIcon, ExpandLayout)
 
 
 class SettingCardGroup(QWidget):
@@ -1,4 +1,5 @@
-from src.importer import *
+from enum import Enum
+from src.importer import qconfig, Theme, StyleSheetBase
 from src.module import cfg
 
 class StyleSheet(StyleSheetBase, Enum):
@@ -1,4 +1,5 @@
-from src.importer import *
+from pathlib import Path
+from src.importer import ConfigValidator
 
 
 class ExeListValidator(ConfigValidator):